@@ -0,0 +1,59 @@
+import timeit
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from audit import recorder
+from vendors.models import Service
+
+
+class Command(BaseCommand):
+    help = 'Time the per-save cost of audit logging (snapshot on load, diff on save)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--services', type=int, default=10000, help='How many services to load and diff.')
+        parser.add_argument('--repeat', type=int, default=5, help='Timing runs (best is kept).')
+
+    def build_rows(self, count):
+        # Rows as the database would return them, so this doesn't need a database
+        now = timezone.now()
+        field_names = [f.attname for f in Service._meta.concrete_fields]
+        rows = []
+        for i in range(1, count + 1):
+            values = {
+                'id': i,
+                'vendor_id': 1,
+                'service_name': f'Service {i}',
+                'start_date': date(2025, 1, 1),
+                'expiry_date': date(2025, 1, 1) + timedelta(days=30 + i % 700),
+                'payment_due_date': date(2025, 1, 1) + timedelta(days=15 + i % 365),
+                'amount': Decimal('1000.00') + i,
+                'status': 'active',
+                'created_at': now,
+                'updated_at': now,
+                'created_by_id': 1,
+            }
+            rows.append([values.get(name) for name in field_names])
+        return field_names, rows
+
+    def handle(self, *args, **options):
+        count = options['services']
+        field_names, rows = self.build_rows(count)
+
+        def load():
+            return [Service.from_db('default', field_names, row) for row in rows]
+
+        services = load()
+        for service in services[::2]:
+            service.status = 'completed'
+
+        def diff():
+            return [recorder.compute_changes(service, False) for service in services]
+
+        changed = sum(1 for changes in diff() if changes)
+        self.stdout.write(f'{count} services, {changed} changed, best of {options["repeat"]} runs\n')
+        for name, func in (('load + snapshot', load), ('diff', diff)):
+            seconds = min(timeit.repeat(func, number=1, repeat=options['repeat']))
+            self.stdout.write(f'{name:16} {seconds * 1000:8.1f} ms   {seconds / count * 1e6:6.2f} us/service')
@@ -0,0 +1,12 @@
+from . import recorder
+
+
+class AuditMiddleware:
+    """Buffers audit entries for the request and writes them once it's done"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with recorder.buffered(request):
+            return self.get_response(request)
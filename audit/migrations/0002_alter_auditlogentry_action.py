@@ -0,0 +1,27 @@
+# Generated by Django 5.0.2 on 2026-10-19 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("audit", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="auditlogentry",
+            name="action",
+            field=models.CharField(
+                choices=[
+                    ("create", "Create"),
+                    ("update", "Update"),
+                    ("delete", "Delete"),
+                    ("status", "Status Change"),
+                    ("archive", "Archive"),
+                ],
+                max_length=10,
+            ),
+        ),
+    ]
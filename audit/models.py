@@ -0,0 +1,40 @@
+from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+
+
+class AuditLogEntry(models.Model):
+    """One change to a vendor or service. Rows are only ever added."""
+    
+    ACTION_CHOICES = [
+        ('create', 'Create'),
+        ('update', 'Update'),
+        ('delete', 'Delete'),
+        ('status', 'Status Change'),
+        ('archive', 'Archive'),
+    ]
+    
+    object_type = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    # {field: [old, new]}, only the fields that changed
+    changes = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    user = models.ForeignKey(
+        User, null=True, blank=True, on_delete=models.SET_NULL,
+        related_name='audit_entries', db_index=False
+    )
+    # When the change happened, not when the entry was written
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Audit Log Entry'
+        verbose_name_plural = 'Audit Log Entries'
+        indexes = [
+            models.Index(fields=['object_type', 'object_id', 'created_at'], name='audit_object_idx'),
+            models.Index(fields=['user', 'created_at'], name='audit_user_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.action} {self.object_type} {self.object_id}"
@@ -0,0 +1,60 @@
+from celery.signals import task_postrun, task_prerun
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from vendors.models import Service, Vendor
+from vendors.signals import services_archived, services_status_changed
+from . import recorder
+
+# task id -> buffer tokens for tasks running in this process
+_task_buffers = {}
+
+AUDITED_MODELS = {
+    Vendor: 'vendor',
+    Service: 'service',
+}
+
+
+@receiver(post_save)
+def audit_save(sender, instance, created, **kwargs):
+    object_type = AUDITED_MODELS.get(sender)
+    if object_type is None:
+        return
+    changes = recorder.compute_changes(instance, created)
+    if created or changes:
+        recorder.record(object_type, instance.pk, 'create' if created else 'update', changes)
+
+
+@receiver(post_delete)
+def audit_delete(sender, instance, **kwargs):
+    object_type = AUDITED_MODELS.get(sender)
+    if object_type is not None:
+        recorder.record(object_type, instance.pk, 'delete')
+
+
+@receiver(services_status_changed)
+def audit_batch_status(sender, status, changes, **kwargs):
+    recorder.record_many(
+        'service',
+        [(service_id, {'status': [previous, status]}) for service_id, previous in changes],
+        'status'
+    )
+
+
+@receiver(services_archived)
+def audit_archive(sender, ids, **kwargs):
+    recorder.record_many('service', [(service_id, None) for service_id in ids], 'archive')
+
+
+@task_prerun.connect
+def start_task_buffer(task_id=None, kwargs=None, **extra):
+    # Tasks run on behalf of a user take it as a user_id keyword argument
+    user_id = (kwargs or {}).get('user_id')
+    _task_buffers[task_id] = recorder.start_buffer(user_id=user_id)
+
+
+@task_postrun.connect
+def flush_task_buffer(task_id=None, **kwargs):
+    tokens = _task_buffers.pop(task_id, None)
+    if tokens is not None:
+        recorder.end_buffer(tokens)
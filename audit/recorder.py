@@ -0,0 +1,129 @@
+# Collects audit entries in memory and writes them in batches
+# During a request or a Celery task entries are buffered and written with one
+# bulk insert when it finishes (or when the buffer reaches AUDIT_MAX_BUFFER).
+# Entries made inside a transaction only reach the buffer once it commits, so
+# rolled back changes are never logged. Anywhere else (shell, management
+# commands) each committed group of entries is written straight away, use
+# buffered() to batch those too.
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import AuditLogEntry
+
+logger = logging.getLogger(__name__)
+
+_buffer = ContextVar('audit_buffer', default=None)
+_request = ContextVar('audit_request', default=None)
+# Who to credit when there's no request, e.g. a task started by a user
+_user_id = ContextVar('audit_user_id', default=None)
+
+# Changes to these are bookkeeping, not edits
+IGNORED_FIELDS = {'created_at', 'updated_at', 'next_notification_at', 'last_notified_on'}
+
+
+def start_buffer(request=None, user_id=None):
+    """Start buffering (for a request or a user if given), returns tokens for end_buffer()"""
+    return _buffer.set([]), _request.set(request), _user_id.set(user_id)
+
+
+def end_buffer(tokens):
+    try:
+        flush()
+    finally:
+        buffer_token, request_token, user_token = tokens
+        _buffer.reset(buffer_token)
+        _request.reset(request_token)
+        _user_id.reset(user_token)
+
+
+@contextmanager
+def buffered(request=None, user_id=None):
+    tokens = start_buffer(request, user_id)
+    try:
+        yield
+    finally:
+        end_buffer(tokens)
+
+
+def current_user_id():
+    if _user_id.get() is not None:
+        return _user_id.get()
+    # DRF copies the user it authenticated (JWT) onto the Django request
+    request = _request.get()
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.pk
+    return None
+
+
+def compute_changes(instance, created):
+    """{attname: [old, new]} for the fields that changed since the row was loaded"""
+    loaded = {} if created else getattr(instance, '_loaded_values', None)
+    if loaded is None:
+        # Not loaded from the database (or it has no snapshot), nothing to compare with
+        return {}
+
+    changes = {}
+    for field in instance._meta.concrete_fields:
+        name = field.attname
+        if name in IGNORED_FIELDS or name not in instance.__dict__:
+            continue
+        new = instance.__dict__[name]
+        if created:
+            changes[name] = [None, new]
+        elif name in loaded and loaded[name] != new:
+            changes[name] = [loaded[name], new]
+    return changes
+
+
+def record(object_type, object_id, action, changes=None):
+    record_many(object_type, [(object_id, changes)], action)
+
+
+def record_many(object_type, items, action):
+    """One entry per (object_id, changes) in items, all with the same action"""
+    user_id = current_user_id()
+    entries = [
+        AuditLogEntry(
+            object_type=object_type,
+            object_id=object_id,
+            action=action,
+            changes=changes or {},
+            user_id=user_id,
+        )
+        for object_id, changes in items
+    ]
+    if not entries:
+        return
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _committed(entries))
+    else:
+        _committed(entries)
+
+
+def _committed(entries):
+    buffer = _buffer.get()
+    if buffer is None:
+        AuditLogEntry.objects.bulk_create(entries, batch_size=500)
+        return
+    buffer.extend(entries)
+    if len(buffer) >= settings.AUDIT_MAX_BUFFER:
+        flush()
+
+
+def flush():
+    """Write everything buffered so far with one insert"""
+    buffer = _buffer.get()
+    if not buffer:
+        return
+    entries = list(buffer)
+    buffer.clear()
+    try:
+        AuditLogEntry.objects.bulk_create(entries, batch_size=500)
+    except Exception:
+        # The changes themselves are already committed, don't fail the request
+        logger.exception('Could not write %s audit log entries', len(entries))
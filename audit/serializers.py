@@ -0,0 +1,8 @@
+from rest_framework import serializers
+from .models import AuditLogEntry
+
+
+class AuditLogEntrySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AuditLogEntry
+        fields = ['id', 'object_type', 'object_id', 'action', 'changes', 'user', 'created_at']
@@ -0,0 +1,6 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('', views.AuditLogListView.as_view(), name='audit-log'),
+]
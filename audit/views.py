@@ -0,0 +1,15 @@
+from rest_framework import generics
+from rest_framework.permissions import IsAuthenticated
+from django_filters.rest_framework import DjangoFilterBackend
+from .models import AuditLogEntry
+from .serializers import AuditLogEntrySerializer
+
+
+class AuditLogListView(generics.ListAPIView):
+    """History of changes, filter by ?object_type=&object_id= or ?user="""
+
+    queryset = AuditLogEntry.objects.all()
+    serializer_class = AuditLogEntrySerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['object_type', 'object_id', 'user', 'action']
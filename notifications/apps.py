@@ -6,4 +6,6 @@ class NotificationsConfig(AppConfig):
     name = 'notifications'
     
     def ready(self):
-        import notifications.signals
\ No newline at end of file
+        import notifications.signals
+        import notifications.instrumentation
+        import notifications.contact_cache
\ No newline at end of file
@@ -0,0 +1,256 @@
+# Per-process cache of vendor contact details and user emails
+# Reminder tasks for thousands of services only involve a few hundred vendors
+# and users, so each worker keeps what it looked up in a small LRU cache.
+# Entries expire after CONTACT_CACHE_TTL seconds. Saving a vendor or user
+# publishes its key on a Redis channel and every process drops its copy, so a
+# changed email doesn't wait for the TTL. If Redis is unreachable the TTL still
+# bounds how stale an entry can get.
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import redis
+from celery.signals import task_postrun
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from vendors.models import Vendor
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'contact_cache:invalidate'
+STATS_KEY = 'contact_cache:stats'
+
+VendorContact = namedtuple('VendorContact', ['name', 'contact_person', 'email'])
+
+
+class LRUCache:
+    """Thread safe LRU cache whose entries also expire after `ttl` seconds"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every invalidate()/clear(). A load only stores its value if
+        # its key wasn't invalidated (or the cache cleared) while it ran.
+        self._generation = 0
+        self._invalidated = {}
+        self._cleared_at = 0
+        self._loading = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key, loader):
+        """The cached value for key, calling loader() on a miss"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[1] > now:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            started_at = self._generation
+            self._loading += 1
+
+        # Load outside the lock so one slow query doesn't block other threads
+        try:
+            value = loader()
+        except BaseException:
+            with self._lock:
+                self._finish_load()
+            raise
+        with self._lock:
+            if self._invalidated.get(key, 0) <= started_at and self._cleared_at <= started_at:
+                self._data[key] = (value, now + self.ttl)
+                self._data.move_to_end(key)
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+                    self.evictions += 1
+            self._finish_load()
+        return value
+
+    def _finish_load(self):
+        # Invalidations only matter to loads that were running at the time
+        self._loading -= 1
+        if not self._loading:
+            self._invalidated.clear()
+
+    def invalidate(self, key):
+        with self._lock:
+            self._generation += 1
+            if self._loading:
+                self._invalidated[key] = self._generation
+            if self._data.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._cleared_at = self._generation
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+cache = LRUCache(settings.CONTACT_CACHE_SIZE, settings.CONTACT_CACHE_TTL)
+
+_client = None
+_listener = None
+_listener_pid = None
+_listener_guard = threading.Lock()
+_retry_at = 0.0
+_publish_retry_at = 0.0
+_last_report = 0.0
+
+
+def get_client():
+    # Publishing runs after every vendor/user save in the web process, so a
+    # hung Redis must not hold those requests up
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(
+            settings.CONTACT_CACHE_REDIS_URL, socket_connect_timeout=0.5, socket_timeout=0.5
+        )
+    return _client
+
+
+def get_vendor_contact(vendor_id):
+    _ensure_listener()
+    return cache.get(f'vendor:{vendor_id}', lambda: VendorContact(
+        *Vendor.objects.filter(pk=vendor_id).values_list('name', 'contact_person', 'email').get()
+    ))
+
+
+def get_user_email(user_id):
+    _ensure_listener()
+    return cache.get(f'user:{user_id}', lambda: User.objects.filter(pk=user_id).values_list('email', flat=True).get())
+
+
+def _handle_message(message):
+    cache.invalidate(message['data'].decode())
+
+
+def _listener_failed(exc, pubsub, thread):
+    # Let _ensure_listener() start a new one on the next lookup
+    global _listener
+    logger.warning('Contact cache invalidation listener stopped: %s', exc)
+    thread.stop()
+    pubsub.close()
+    # Invalidations may have been missed while it was down
+    cache.clear()
+    _listener = None
+
+
+def _ensure_listener():
+    """Subscribe this process to invalidations, once (again after a fork)"""
+    global _listener, _listener_pid, _retry_at
+    pid = os.getpid()
+    if _listener_pid == pid and (_listener is not None or time.monotonic() < _retry_at):
+        return
+    with _listener_guard:
+        if _listener_pid == pid and (_listener is not None or time.monotonic() < _retry_at):
+            return
+        if _listener_pid != pid:
+            # Forked from a process that had a cache, its entries were never
+            # covered by a subscription in this process
+            cache.clear()
+        try:
+            # Own connection without a read timeout, it waits for messages
+            listener_client = redis.Redis.from_url(
+                settings.CONTACT_CACHE_REDIS_URL, socket_connect_timeout=0.5
+            )
+            pubsub = listener_client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{CHANNEL: _handle_message})
+            _listener = pubsub.run_in_thread(
+                sleep_time=1, daemon=True, exception_handler=_listener_failed
+            )
+        except redis.RedisError:
+            logger.warning('Could not subscribe to contact cache invalidations', exc_info=True)
+            # Rely on the TTL for a while rather than retrying on every lookup
+            _listener = None
+            _retry_at = time.monotonic() + 30
+        _listener_pid = pid
+
+
+def publish_invalidation(key):
+    global _publish_retry_at
+    cache.invalidate(key)
+    if time.monotonic() < _publish_retry_at:
+        # Redis was down a moment ago, the TTL covers the other processes
+        return
+    try:
+        get_client().publish(CHANNEL, key)
+    except redis.RedisError as exc:
+        logger.warning('Could not publish contact cache invalidation for %s: %s', key, exc)
+        _publish_retry_at = time.monotonic() + 30
+
+
+@receiver([post_save, post_delete], sender=Vendor)
+def vendor_changed(sender, instance, **kwargs):
+    key = f'vendor:{instance.pk}'
+    transaction.on_commit(lambda: publish_invalidation(key))
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    key = f'user:{instance.pk}'
+    transaction.on_commit(lambda: publish_invalidation(key))
+
+
+@task_postrun.connect
+def report_stats(**kwargs):
+    """Publish this worker's cache stats, at most every CONTACT_CACHE_STATS_INTERVAL seconds"""
+    global _last_report
+    now = time.monotonic()
+    if now - _last_report < settings.CONTACT_CACHE_STATS_INTERVAL:
+        return
+    _last_report = now
+    stats = cache.stats()
+    if not stats['hits'] and not stats['misses']:
+        return
+    stats['updated_at'] = time.time()
+    try:
+        pipe = get_client().pipeline(transaction=False)
+        pipe.hset(STATS_KEY, f'{socket.gethostname()}:{os.getpid()}', json.dumps(stats))
+        # Stopped workers' entries go away eventually
+        pipe.expire(STATS_KEY, 24 * 60 * 60)
+        pipe.execute()
+    except redis.RedisError:
+        logger.warning('Could not report contact cache stats', exc_info=True)
+
+
+def summary():
+    """Stats per worker process plus the overall hit rate"""
+    workers = {
+        name.decode(): json.loads(value)
+        for name, value in get_client().hgetall(STATS_KEY).items()
+    }
+    hits = sum(worker['hits'] for worker in workers.values())
+    lookups = hits + sum(worker['misses'] for worker in workers.values())
+    return {
+        'hits': hits,
+        'misses': lookups - hits,
+        'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+        'workers': workers,
+    }
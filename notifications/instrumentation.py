@@ -0,0 +1,158 @@
+# Worker-side task metrics, collected with Celery signals
+# Per task name we keep totals for runtime, DB queries/time, SMTP time and
+# time spent waiting in the queue. Totals live in Redis so the web process
+# (metrics endpoint, task_metrics command) can read what the workers recorded.
+import logging
+import time
+from contextlib import contextmanager
+
+import redis
+from celery import current_task
+from celery.signals import before_task_publish, task_failure, task_postrun, task_prerun
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'task_metrics'
+TASKS_KEY = f'{KEY_PREFIX}:tasks'
+
+_client = None
+# task id -> metrics for tasks running in this process
+_running = {}
+
+
+def get_client():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.TASK_METRICS_REDIS_URL)
+    return _client
+
+
+class _QueryTimer:
+    """Execute wrapper counting queries and time spent in the database"""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.metrics['db_queries'] += 1
+            self.metrics['db_time'] += time.perf_counter() - start
+
+
+@contextmanager
+def smtp_timer():
+    """Count the time spent talking to the mail server against the current task"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        task = current_task
+        metrics = _running.get(task.request.id) if task else None
+        if metrics is not None:
+            metrics['smtp_time'] += time.perf_counter() - start
+
+
+@before_task_publish.connect
+def add_publish_time(headers=None, **kwargs):
+    # Lets the worker work out how long the task sat in the queue
+    if headers is not None:
+        headers.setdefault('published_at', time.time())
+
+
+@task_prerun.connect
+def start_task_metrics(task_id=None, task=None, **kwargs):
+    published_at = getattr(task.request, 'published_at', None)
+    if published_at is None:
+        published_at = (getattr(task.request, 'headers', None) or {}).get('published_at')
+
+    metrics = {
+        'start': time.perf_counter(),
+        'queue_wait': max(time.time() - published_at, 0.0) if published_at else 0.0,
+        'db_queries': 0,
+        'db_time': 0.0,
+        'smtp_time': 0.0,
+        'failed': False,
+    }
+    metrics['wrapper'] = _QueryTimer(metrics)
+    connection.execute_wrappers.append(metrics['wrapper'])
+    _running[task_id] = metrics
+
+
+@task_failure.connect
+def mark_task_failed(task_id=None, **kwargs):
+    if task_id in _running:
+        _running[task_id]['failed'] = True
+
+
+@task_postrun.connect
+def record_task_metrics(task_id=None, task=None, **kwargs):
+    metrics = _running.pop(task_id, None)
+    if metrics is None:
+        return
+    if metrics['wrapper'] in connection.execute_wrappers:
+        connection.execute_wrappers.remove(metrics['wrapper'])
+
+    record(task.name, {
+        'count': 1,
+        'failures': int(metrics['failed']),
+        'runtime': time.perf_counter() - metrics['start'],
+        'db_queries': metrics['db_queries'],
+        'db_time': metrics['db_time'],
+        'smtp_time': metrics['smtp_time'],
+        'queue_wait': metrics['queue_wait'],
+    })
+
+
+def record(task_name, values):
+    """Add one run's numbers to the totals for a task"""
+    key = f'{KEY_PREFIX}:{task_name}'
+    try:
+        pipe = get_client().pipeline(transaction=False)
+        pipe.sadd(TASKS_KEY, task_name)
+        pipe.hsetnx(key, 'since', time.time())
+        for name, value in values.items():
+            if isinstance(value, int):
+                pipe.hincrby(key, name, value)
+            else:
+                pipe.hincrbyfloat(key, name, value)
+        pipe.execute()
+    except redis.RedisError:
+        # Metrics must never break the task itself
+        logger.warning('Could not record metrics for %s', task_name, exc_info=True)
+
+
+def summary():
+    """Totals and averages per task name, busiest first"""
+    client = get_client()
+    now = time.time()
+    rows = []
+    for raw_name in client.smembers(TASKS_KEY):
+        name = raw_name.decode()
+        data = {k.decode(): float(v) for k, v in client.hgetall(f'{KEY_PREFIX}:{name}').items()}
+        count = int(data.get('count', 0))
+        if not count:
+            continue
+        elapsed = max(now - data.get('since', now), 1.0)
+        rows.append({
+            'task': name,
+            'count': count,
+            'failures': int(data.get('failures', 0)),
+            'throughput_per_min': round(count / elapsed * 60, 2),
+            'avg_runtime_ms': round(data.get('runtime', 0) / count * 1000, 2),
+            'avg_db_queries': round(data.get('db_queries', 0) / count, 2),
+            'avg_db_time_ms': round(data.get('db_time', 0) / count * 1000, 2),
+            'avg_smtp_time_ms': round(data.get('smtp_time', 0) / count * 1000, 2),
+            'avg_queue_wait_ms': round(data.get('queue_wait', 0) / count * 1000, 2),
+        })
+    return sorted(rows, key=lambda row: row['count'], reverse=True)
+
+
+def reset():
+    client = get_client()
+    names = [name.decode() for name in client.smembers(TASKS_KEY)]
+    client.delete(TASKS_KEY, *[f'{KEY_PREFIX}:{name}' for name in names])
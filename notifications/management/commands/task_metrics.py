@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from notifications import instrumentation
+
+COLUMNS = [
+    ('task', 'Task', 45),
+    ('count', 'Runs', 8),
+    ('failures', 'Failed', 7),
+    ('throughput_per_min', 'Per min', 9),
+    ('avg_runtime_ms', 'Run ms', 9),
+    ('avg_db_queries', 'Queries', 8),
+    ('avg_db_time_ms', 'DB ms', 9),
+    ('avg_smtp_time_ms', 'SMTP ms', 9),
+    ('avg_queue_wait_ms', 'Wait ms', 10),
+]
+
+
+class Command(BaseCommand):
+    help = 'Show per task averages recorded by the Celery workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Clear the recorded metrics.')
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            instrumentation.reset()
+            self.stdout.write(self.style.SUCCESS('Task metrics cleared'))
+            return
+
+        rows = instrumentation.summary()
+        if not rows:
+            self.stdout.write('No task metrics recorded yet')
+            return
+
+        # Task names left aligned, numbers right aligned
+        self.stdout.write(' '.join(
+            f'{title:<{width}}' if key == 'task' else f'{title:>{width}}'
+            for key, title, width in COLUMNS
+        ))
+        for row in rows:
+            self.stdout.write(' '.join(
+                f'{row[key]:<{width}}' if key == 'task' else f'{row[key]:>{width}}'
+                for key, _, width in COLUMNS
+            ))
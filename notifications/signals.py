@@ -1,13 +1,13 @@
+from django.db import transaction
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from django.utils import timezone
 from vendors.models import Service
-from .tasks import check_expiring_services, check_payment_due_services
+from .tasks import check_service_reminders
 
 
 @receiver(post_save, sender=Service)
 def service_post_save(sender, instance, created, **kwargs):
-    """Run reminder checks when a service is saved"""
-    if created or instance.status == 'active':
-        # Check if we need to send any reminders
-        check_expiring_services.delay()
-        check_payment_due_services.delay()
+    """Send reminders straight away if the saved service already needs one"""
+    if instance.next_notification_at and instance.next_notification_at <= timezone.now():
+        transaction.on_commit(lambda: check_service_reminders.delay(instance.id))
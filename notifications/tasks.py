@@ -1,76 +1,183 @@
-from celery import shared_task
+import logging
+from datetime import datetime
+
+from celery import chord, shared_task
+from django.conf import settings
 from django.core.mail import send_mail
+from django.db.models import Max, Min
 from django.template.loader import render_to_string
 from django.utils import timezone
-from datetime import timedelta
 from vendors.models import Service
+from vendors.reminders import due_reminder_kinds, reminder_targets
+from .contact_cache import get_user_email, get_vendor_contact
+from .instrumentation import smtp_timer
 
+logger = logging.getLogger(__name__)
 
-@shared_task
-def check_expiring_services():
-    """Check for services expiring soon and send reminders"""
-    today = timezone.now().date()
-    fifteen_days_later = today + timedelta(days=15)
+
+def _process_due_service(service, today):
+    """Queue the reminders that are due for one service and move its schedule on
+    
+    Returns the reminder kinds that were queued.
+    """
+    kinds = due_reminder_kinds(
+        reminder_targets(service.expiry_date, service.payment_due_date, service.status),
+        service.reminder_schedule,
+        service.last_notified_on,
+        today
+    )
+    for kind in kinds:
+        REMINDER_TASKS[kind].delay(service.id)
     
-    # Find services that expire in the next 15 days
-    expiring_services = Service.objects.filter(
-        expiry_date__range=[today, fifteen_days_later],
-        status='active'
-    ).select_related('vendor', 'created_by')
+    if kinds:
+        service.last_notified_on = today
+    service.refresh_next_notification(today)
+    return kinds
+
+
+def _scan_due_range(now, first_id, last_id):
+    """Process the due services with ids in [first_id, last_id], returns counts"""
+    today = now.date()
+    # A range lookup on the next_notification_at index, however many
+    # thresholds the schedules have
+    due_services = Service.objects.filter(
+        next_notification_at__lte=now,
+        id__gte=first_id,
+        id__lte=last_id
+    ).select_related('vendor')
     
-    for service in expiring_services:
-        # Send email reminder directly
-        send_expiry_reminder.delay(service.id)
+    batch = []
+    services = 0
+    sent = 0
+    for service in due_services.iterator(chunk_size=500):
+        sent += len(_process_due_service(service, today))
+        services += 1
+        batch.append(service)
+        if len(batch) >= 500:
+            # bulk_update skips save() and post_save, so no reminder loop
+            Service.objects.bulk_update(batch, ['last_notified_on', 'next_notification_at'])
+            batch = []
+    if batch:
+        Service.objects.bulk_update(batch, ['last_notified_on', 'next_notification_at'])
+    return {'services': services, 'reminders': sent}
+
+
+def shard_ranges(first_id, last_id, shards):
+    """Split [first_id, last_id] into at most `shards` contiguous id ranges"""
+    size = -(-(last_id - first_id + 1) // max(shards, 1))
+    return [
+        (start, min(start + size - 1, last_id))
+        for start in range(first_id, last_id + 1, size)
+    ]
+
+
+@shared_task(ignore_result=True)
+def check_due_reminders(shards=None):
+    """Send every reminder whose next_notification_at has been reached
+    
+    The due services are split into service id ranges, each scanned by its
+    own task so the work spreads over all the workers.
+    """
+    now = timezone.now()
+    shards = shards or settings.REMINDER_SCAN_SHARDS
+    bounds = Service.objects.filter(next_notification_at__lte=now).aggregate(
+        first_id=Min('id'), last_id=Max('id')
+    )
+    if bounds['first_id'] is None:
+        logger.info("No reminders due")
+        return
+    
+    ranges = shard_ranges(bounds['first_id'], bounds['last_id'], shards)
+    if len(ranges) == 1:
+        reminder_scan_done([_scan_due_range(now, *ranges[0])])
+        return
+    
+    # Every shard uses the same cut-off, so a service that becomes due while
+    # the scan runs waits for the next one rather than being split across two
+    chord([
+        scan_reminder_shard.s(now.isoformat(), first_id, last_id)
+        for first_id, last_id in ranges
+    ])(reminder_scan_done.s())
 
 
 @shared_task
-def check_payment_due_services():
-    """Check for services with payment due soon and send reminders"""
+def scan_reminder_shard(now, first_id, last_id):
+    """Scan one id range, the result goes to reminder_scan_done"""
+    counts = _scan_due_range(datetime.fromisoformat(now), first_id, last_id)
+    logger.info(
+        "Shard %s-%s: queued %s reminders for %s services",
+        first_id, last_id, counts['reminders'], counts['services']
+    )
+    return counts
+
+
+@shared_task(ignore_result=True)
+def reminder_scan_done(results):
+    """Chord callback, adds up what the shards did"""
+    services = sum(result['services'] for result in results)
+    sent = sum(result['reminders'] for result in results)
+    logger.info("Queued %s reminders for %s services across %s shards", sent, services, len(results))
+
+
+@shared_task(ignore_result=True)
+def check_service_reminders(service_id):
+    """Send the reminders due for one service, used right after it's saved"""
     today = timezone.now().date()
-    fifteen_days_later = today + timedelta(days=15)
-    
-    # Find services with payment due in the next 15 days
-    payment_due_services = Service.objects.filter(
-        payment_due_date__range=[today, fifteen_days_later],
-        status__in=['active', 'payment_pending']
-    ).select_related('vendor', 'created_by')
+    try:
+        service = Service.objects.select_related('vendor').get(
+            id=service_id,
+            next_notification_at__lte=timezone.now()
+        )
+    except Service.DoesNotExist:
+        # Nothing due any more, or the service is gone
+        return
     
-    for service in payment_due_services:
-        # Send email reminder directly
-        send_payment_reminder.delay(service.id)
+    kinds = _process_due_service(service, today)
+    Service.objects.filter(id=service.id).update(
+        last_notified_on=service.last_notified_on,
+        next_notification_at=service.next_notification_at
+    )
+    logger.info("Queued %s reminders for service %s", len(kinds), service_id)
 
 
-@shared_task
+@shared_task(ignore_result=True)
 def send_expiry_reminder(service_id):
     """Send email reminder for expiring service"""
     try:
+        # Vendor and creator come from the worker's contact cache, not a join
         service = Service.objects.get(id=service_id)
-        
-        subject = f"Service Expiry Reminder: {service.service_name}"
-        
-        # Send email to vendor and creator
-        recipients = [service.vendor.email, service.created_by.email]
-        recipients = list(dict.fromkeys(recipients))  # Remove duplicates
-        
-        message = f"""
-Dear {service.vendor.contact_person},
-
-This is a reminder that the service "{service.service_name}" for vendor "{service.vendor.name}" 
+    except Service.DoesNotExist:
+        logger.warning("Service with id %s not found", service_id)
+        return
+    
+    subject = f"Service Expiry Reminder: {service.service_name}"
+    
+    vendor = get_vendor_contact(service.vendor_id)
+    
+    # Send email to vendor and creator
+    recipients = [vendor.email, get_user_email(service.created_by_id)]
+    recipients = list(dict.fromkeys(recipients))  # Remove duplicates
+    
+    message = f"""
+Dear {vendor.contact_person},
+
+This is a reminder that the service "{service.service_name}" for vendor "{vendor.name}" 
 is expiring in {service.days_until_expiry} days on {service.expiry_date}.
 
 Please take necessary action to renew or extend the service.
 
 Service Details:
 - Service Name: {service.service_name}
-- Vendor: {service.vendor.name}
+- Vendor: {vendor.name}
 - Start Date: {service.start_date}
 - Expiry Date: {service.expiry_date}
 - Amount: ${service.amount}
 
 Best regards,
 Vendor Management System
-        """
-        
+    """
+    
+    with smtp_timer():
         send_mail(
             subject=subject,
             message=message,
@@ -78,46 +185,48 @@ Vendor Management System
             recipient_list=recipients,
             fail_silently=False,
         )
-        
-        return f"Expiry reminder sent for service {service.service_name}"
-        
-    except Service.DoesNotExist:
-        return f"Service with id {service_id} not found"
-    except Exception as e:
-        return f"Error sending expiry reminder: {str(e)}"
+    
+    logger.info("Expiry reminder sent for service %s", service.service_name)
 
 
-@shared_task
+@shared_task(ignore_result=True)
 def send_payment_reminder(service_id):
     """Send email reminder for payment due"""
     try:
+        # Vendor and creator come from the worker's contact cache, not a join
         service = Service.objects.get(id=service_id)
-        
-        subject = f"Payment Due Reminder: {service.service_name}"
-        
-        # Send email to vendor and creator
-        recipients = [service.vendor.email, service.created_by.email]
-        recipients = list(dict.fromkeys(recipients))  # Remove duplicates
-        
-        message = f"""
-Dear {service.vendor.contact_person},
-
-This is a reminder that payment for the service "{service.service_name}" for vendor "{service.vendor.name}" 
+    except Service.DoesNotExist:
+        logger.warning("Service with id %s not found", service_id)
+        return
+    
+    subject = f"Payment Due Reminder: {service.service_name}"
+    
+    vendor = get_vendor_contact(service.vendor_id)
+    
+    # Send email to vendor and creator
+    recipients = [vendor.email, get_user_email(service.created_by_id)]
+    recipients = list(dict.fromkeys(recipients))  # Remove duplicates
+    
+    message = f"""
+Dear {vendor.contact_person},
+
+This is a reminder that payment for the service "{service.service_name}" for vendor "{vendor.name}" 
 is due in {service.days_until_payment_due} days on {service.payment_due_date}.
 
 Please ensure payment is processed before the due date.
 
 Service Details:
 - Service Name: {service.service_name}
-- Vendor: {service.vendor.name}
+- Vendor: {vendor.name}
 - Start Date: {service.start_date}
 - Payment Due Date: {service.payment_due_date}
 - Amount: ${service.amount}
 
 Best regards,
 Vendor Management System
-        """
-        
+    """
+    
+    with smtp_timer():
         send_mail(
             subject=subject,
             message=message,
@@ -125,18 +234,17 @@ Vendor Management System
             recipient_list=recipients,
             fail_silently=False,
         )
-        
-        return f"Payment reminder sent for service {service.service_name}"
-        
-    except Service.DoesNotExist:
-        return f"Service with id {service_id} not found"
-    except Exception as e:
-        return f"Error sending payment reminder: {str(e)}"
+    
+    logger.info("Payment reminder sent for service %s", service.service_name)
 
 
-@shared_task
+@shared_task(ignore_result=True)
 def daily_reminder_check():
     """Run daily checks for expiring and payment due services"""
-    check_expiring_services.delay()
-    check_payment_due_services.delay()
-    return "Daily reminder check completed"
+    check_due_reminders.delay()
+
+
+REMINDER_TASKS = {
+    'expiry': send_expiry_reminder,
+    'payment': send_payment_reminder,
+}
@@ -1,3 +1,96 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.utils import timezone
+
+from vendors.models import Service, Vendor
+from .tasks import REMINDER_TASKS, check_due_reminders, check_service_reminders
+
+
+class ReminderScanTests(TestCase):
+    """Runs the daily scan over simulated days and records what was sent"""
+
+    def setUp(self):
+        self.day0 = timezone.now().date()
+        self.user = User.objects.create_user('reminders', 'reminders@example.com', 'password')
+        self.vendor = Vendor.objects.create(
+            name='Reminder Vendor', contact_person='Rem', email='vendor@example.com',
+            created_by=self.user
+        )
+        self.sent = []
+        tasks = {
+            kind: mock.Mock(**{'delay.side_effect': lambda service_id, kind=kind: self.sent.append((self.day, kind))})
+            for kind in REMINDER_TASKS
+        }
+        patcher = mock.patch.dict(REMINDER_TASKS, tasks)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.day = 0
+
+    def at_day(self, day):
+        """Patch timezone.now to noon on day0 + day"""
+        self.day = day
+        moment = timezone.make_aware(datetime.combine(self.day0 + timedelta(days=day), time(12)))
+        return mock.patch('django.utils.timezone.now', return_value=moment)
+
+    def make_service(self, expiry_in, payment_in, reminder_days='30,15,7,1'):
+        with self.at_day(0):
+            return Service.objects.create(
+                vendor=self.vendor,
+                service_name='Scanned',
+                start_date=self.day0 - timedelta(days=30),
+                expiry_date=self.day0 + timedelta(days=expiry_in),
+                payment_due_date=self.day0 + timedelta(days=payment_in),
+                amount=Decimal('100.00'),
+                reminder_days=reminder_days,
+                created_by=self.user,
+            )
+
+    def scan(self, days):
+        for day in days:
+            with self.at_day(day):
+                check_due_reminders()
+
+    def test_daily_scan_over_45_days(self):
+        service = self.make_service(expiry_in=40, payment_in=20)
+
+        self.scan(range(45))
+
+        # payment thresholds at -10 (missed, so day 0), 5, 13, 19
+        # expiry thresholds at 10, 25, 33, 39
+        self.assertEqual(self.sent, [
+            (0, 'payment'), (5, 'payment'), (10, 'expiry'), (13, 'payment'),
+            (19, 'payment'), (25, 'expiry'), (33, 'expiry'), (39, 'expiry'),
+        ])
+        service.refresh_from_db()
+        self.assertIsNone(service.next_notification_at)
+        self.assertEqual(service.last_notified_on, self.day0 + timedelta(days=39))
+
+    def test_scan_catches_up_after_missed_days(self):
+        self.make_service(expiry_in=40, payment_in=20)
+
+        # The scan didn't run on days 1 to 12
+        self.scan([0, 13, 14])
+
+        # Day 13 sends the missed expiry (day 10) and payment (days 5 and 13)
+        # reminders once each
+        self.assertEqual(self.sent, [(0, 'payment'), (13, 'expiry'), (13, 'payment')])
+
+    def test_check_service_reminders_sends_once(self):
+        service = self.make_service(expiry_in=20, payment_in=90)
+
+        with self.at_day(0):
+            check_service_reminders(service.id)
+            check_service_reminders(service.id)
 
-# Create your tests here.
+        # Created inside the 30 day expiry window, so that reminder is due now
+        self.assertEqual(self.sent, [(0, 'expiry')])
+        service.refresh_from_db()
+        # Next expiry threshold is 15 days before, day 5
+        self.assertEqual(
+            timezone.localtime(service.next_notification_at).date(),
+            self.day0 + timedelta(days=5)
+        )
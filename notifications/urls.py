@@ -0,0 +1,7 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('metrics/tasks/', views.task_metrics, name='task-metrics'),
+    path('metrics/contact-cache/', views.contact_cache_stats, name='contact-cache-stats'),
+]
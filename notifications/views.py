@@ -1,3 +1,18 @@
-from django.shortcuts import render
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from . import contact_cache, instrumentation
 
-# Create your views here.
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def task_metrics(request):
+    """Per task runtime, DB, SMTP and queue wait numbers recorded by the workers"""
+    return Response(instrumentation.summary())
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def contact_cache_stats(request):
+    """Hit rate of the workers' vendor/user contact caches"""
+    return Response(contact_cache.summary())
@@ -0,0 +1,64 @@
+import re
+
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is used without it
+    brotli = None
+
+
+def accepted_encodings(header):
+    """Encodings from an Accept-Encoding header that aren't q=0"""
+    accepted = set()
+    for part in header.split(','):
+        name, _, params = part.partition(';')
+        match = re.search(r'q\s*=\s*([0-9.]+)', params)
+        try:
+            quality = float(match.group(1)) if match else 1.0
+        except ValueError:
+            quality = 0.0
+        if quality > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """Compress responses with brotli or gzip depending on Accept-Encoding
+
+    gzip (including streamed responses and the BREACH padding) is left to
+    Django's GZipMiddleware. This adds brotli when it's installed and the
+    client accepts it, and skips bodies under COMPRESSION_MIN_SIZE bytes.
+    Brotli has no header to pad, so responses that echo secrets next to user
+    input shouldn't rely on it (the API authenticates with JWT headers).
+    """
+
+    def process_response(self, request, response):
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if (
+            brotli is None
+            or 'br' not in accepted
+            or response.streaming
+            or response.has_header('Content-Encoding')
+        ):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressed = brotli.compress(response.content, quality=settings.BROTLI_QUALITY)
+        # Not worth it if it didn't get smaller
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+
+        # The body changed so a strong ETag isn't valid any more
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
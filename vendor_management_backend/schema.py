@@ -0,0 +1,102 @@
+# OpenAPI schema and API docs
+# drf_yasg is only imported the first time the docs are used, so web and
+# worker startup doesn't pay for the schema tooling. The schema itself is
+# generated once (see the generate_openapi_schema command) and served from memory.
+import hashlib
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+_schema = None
+_ui_views = {}
+
+
+def get_api_info():
+    """API details shown at the top of the docs"""
+    from drf_yasg import openapi
+
+    return openapi.Info(
+        title="Vendor Management API",
+        default_version='v1',
+        description="API for managing vendors and their services/contracts",
+        terms_of_service="https://www.google.com/policies/terms/",
+        contact=openapi.Contact(email="contact@vendor-management.com"),
+        license=openapi.License(name="BSD License"),
+    )
+
+
+def generate_schema(fmt='json'):
+    """Introspect every view and return the encoded schema document"""
+    from drf_yasg.codecs import OpenAPICodecJson, OpenAPICodecYaml
+    from drf_yasg.generators import OpenAPISchemaGenerator
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+
+    # Some views pick their serializer from request.method, so they need a
+    # request to introspect (drf_yasg clones it with each endpoint's method)
+    request = Request(APIRequestFactory().get('/'))
+    generator = OpenAPISchemaGenerator(info=get_api_info())
+    schema = generator.get_schema(request=request, public=True)
+    codec = OpenAPICodecYaml if fmt == 'yaml' else OpenAPICodecJson
+    return codec(validators=[]).encode(schema)
+
+
+def schema_format(path):
+    return 'yaml' if Path(path).suffix in ('.yaml', '.yml') else 'json'
+
+
+def load_schema():
+    """Get (content, etag) for the schema, reading the generated file the first time
+
+    Falls back to generating it in-process if the file hasn't been written yet.
+    """
+    global _schema
+    if _schema is None:
+        path = Path(settings.OPENAPI_SCHEMA_PATH)
+        if path.exists():
+            content = path.read_bytes()
+        else:
+            content = generate_schema(schema_format(path))
+        _schema = (content, hashlib.sha256(content).hexdigest())
+    return _schema
+
+
+@condition(etag_func=lambda request: load_schema()[1])
+def openapi_schema(request):
+    """Serve the pre-generated schema, answering 304 when the ETag matches"""
+    content, etag = load_schema()
+    if schema_format(settings.OPENAPI_SCHEMA_PATH) == 'yaml':
+        content_type = 'application/yaml'
+    else:
+        content_type = 'application/json'
+    response = HttpResponse(content, content_type=content_type)
+    patch_cache_control(response, public=True, no_cache=True)
+    return response
+
+
+def _ui_view(renderer):
+    """Build the drf_yasg UI view the first time it's requested"""
+    if renderer not in _ui_views:
+        from drf_yasg.views import get_schema_view
+        from rest_framework import permissions
+
+        schema_view = get_schema_view(
+            get_api_info(),
+            public=True,
+            permission_classes=[permissions.AllowAny],
+        )
+        _ui_views[renderer] = schema_view.with_ui(
+            renderer, cache_timeout=settings.OPENAPI_UI_CACHE_TIMEOUT
+        )
+    return _ui_views[renderer]
+
+
+def swagger_ui(request, *args, **kwargs):
+    return _ui_view('swagger')(request, *args, **kwargs)
+
+
+def redoc_ui(request, *args, **kwargs):
+    return _ui_view('redoc')(request, *args, **kwargs)
@@ -4,6 +4,7 @@
 from pathlib import Path
 from decouple import config
 from datetime import timedelta
+from celery.schedules import crontab
 
 # Project root directory
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -26,17 +27,21 @@ INSTALLED_APPS = [
     "rest_framework_simplejwt",
     "corsheaders",
     "django_filters",
+    "drf_yasg",
     "vendors",
     "notifications",
+    "audit",
 ]
 
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "vendor_management_backend.middleware.CompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "audit.middleware.AuditMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -109,6 +114,15 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'vendor_management_backend.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'vendor_management_backend.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_FILTER_BACKENDS': [
@@ -116,6 +130,63 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
+    # Token buckets per user, expensive endpoints get an extra scope on top
+    'DEFAULT_THROTTLE_CLASSES': [
+        'vendors.throttling.TokenBucketThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'user': config('THROTTLE_RATE_USER', default='2000/hour'),
+        'dashboard': config('THROTTLE_RATE_DASHBOARD', default='60/min'),
+        'search': config('THROTTLE_RATE_SEARCH', default='120/min'),
+        'analytics': config('THROTTLE_RATE_ANALYTICS', default='30/min'),
+    },
+}
+
+# Cache - Redis when CACHE_REDIS_URL is set, otherwise local memory per process
+CACHE_REDIS_URL = config('CACHE_REDIS_URL', default='')
+if CACHE_REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Throttle buckets are kept in Redis, falling back to local memory if it's
+# not set or can't be reached
+THROTTLE_REDIS_URL = config('THROTTLE_REDIS_URL', default=CACHE_REDIS_URL)
+
+# Identical expensive requests arriving together are computed once. Others
+# wait up to SINGLE_FLIGHT_WAIT seconds for that result before computing it
+# themselves.
+SINGLE_FLIGHT_WAIT = config('SINGLE_FLIGHT_WAIT', default=10, cast=int)
+SINGLE_FLIGHT_LOCK_TIMEOUT = config('SINGLE_FLIGHT_LOCK_TIMEOUT', default=30, cast=int)
+
+# Response compression - bodies smaller than this aren't compressed.
+# brotli is used if the package is installed and the client accepts it.
+COMPRESSION_MIN_SIZE = config('COMPRESSION_MIN_SIZE', default=1024, cast=int)
+BROTLI_QUALITY = config('BROTLI_QUALITY', default=4, cast=int)
+
+# How long (seconds) the dashboard bundle is cached for
+DASHBOARD_CACHE_TIMEOUT = config('DASHBOARD_CACHE_TIMEOUT', default=60, cast=int)
+# How long (seconds) analytics timelines are cached for
+ANALYTICS_CACHE_TIMEOUT = config('ANALYTICS_CACHE_TIMEOUT', default=300, cast=int)
+
+# API docs - the schema is generated once with `manage.py generate_openapi_schema`
+# and served from memory, the swagger/redoc pages just point at it
+OPENAPI_SCHEMA_PATH = config('OPENAPI_SCHEMA_PATH', default=str(BASE_DIR / 'openapi.json'))
+OPENAPI_UI_CACHE_TIMEOUT = config('OPENAPI_UI_CACHE_TIMEOUT', default=3600, cast=int)
+SWAGGER_SETTINGS = {
+    'SPEC_URL': 'openapi-schema',
+}
+REDOC_SETTINGS = {
+    'SPEC_URL': 'openapi-schema',
 }
 
 # JWT token settings
@@ -156,3 +227,42 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_TASK_TRACK_STARTED = True
+# Where workers keep their per-task metrics (see notifications/instrumentation.py)
+TASK_METRICS_REDIS_URL = config('TASK_METRICS_REDIS_URL', default=CELERY_BROKER_URL)
+# Workers cache vendor contact details and user emails for reminder emails
+# (see notifications/contact_cache.py). Saves are broadcast on this Redis.
+CONTACT_CACHE_REDIS_URL = config('CONTACT_CACHE_REDIS_URL', default=CELERY_BROKER_URL)
+CONTACT_CACHE_SIZE = config('CONTACT_CACHE_SIZE', default=2000, cast=int)
+CONTACT_CACHE_TTL = config('CONTACT_CACHE_TTL', default=300, cast=int)
+CONTACT_CACHE_STATS_INTERVAL = config('CONTACT_CACHE_STATS_INTERVAL', default=30, cast=int)
+CELERY_BEAT_SCHEDULE = {
+    'daily-reminder-check': {
+        'task': 'notifications.tasks.daily_reminder_check',
+        'schedule': crontab(hour=7, minute=0),
+    },
+    'archive-old-services': {
+        'task': 'vendors.tasks.archive_old_services',
+        'schedule': crontab(hour=2, minute=0),
+    },
+}
+
+# The daily reminder scan is split into this many service id ranges, each
+# scanned by its own task (more shards than workers keeps them all busy)
+REMINDER_SCAN_SHARDS = config('REMINDER_SCAN_SHARDS', default=8, cast=int)
+
+# Archiving old completed/expired services
+ARCHIVE_AFTER_DAYS = config('ARCHIVE_AFTER_DAYS', default=90, cast=int)
+ARCHIVE_BATCH_SIZE = config('ARCHIVE_BATCH_SIZE', default=1000, cast=int)
+
+# Vendor deletes run in the background, deleting this many services at a time
+VENDOR_DELETE_BATCH_SIZE = config('VENDOR_DELETE_BATCH_SIZE', default=1000, cast=int)
+
+# Default reminder schedule - days before expiry/payment due to send reminders.
+# Vendors and services can set their own. The largest value is also the window
+# used for "expiring soon" and "payment due soon".
+REMINDER_DAYS = config('REMINDER_DAYS', default='15')
+
+# Audit log entries are buffered per request and written in one insert when
+# the request finishes, or sooner once this many are waiting
+AUDIT_MAX_BUFFER = config('AUDIT_MAX_BUFFER', default=500, cast=int)
@@ -1,26 +1,14 @@
 # Main URL configuration for the vendor management system
 from django.contrib import admin
 from django.urls import path, include
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-
-schema_view = get_schema_view(
-    openapi.Info(
-        title="Vendor Management API",
-        default_version='v1',
-        description="API for managing vendors and their services/contracts",
-        terms_of_service="https://www.google.com/policies/terms/",
-        contact=openapi.Contact(email="contact@vendor-management.com"),
-        license=openapi.License(name="BSD License"),
-    ),
-    public=True,
-    permission_classes=[permissions.AllowAny],
-)
+from . import schema
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/", include("vendors.urls")),
-    path("swagger/", schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path("redoc/", schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+    path("api/notifications/", include("notifications.urls")),
+    path("api/audit/", include("audit.urls")),
+    path("openapi.json", schema.openapi_schema, name='openapi-schema'),
+    path("swagger/", schema.swagger_ui, name='schema-swagger-ui'),
+    path("redoc/", schema.redoc_ui, name='schema-redoc'),
 ]
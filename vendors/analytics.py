@@ -0,0 +1,177 @@
+from datetime import timedelta
+
+import numpy as np
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import ArchivedService, Service
+
+TRUNC_FUNCTIONS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+# Series that hold money amounts, these get rolling averages and forecasts
+AMOUNT_SERIES = ['payments_due', 'expiring_value', 'overdue']
+
+# Size limits for one timeline, the response and the NumPy arrays grow with
+# buckets (times vendors with by_vendor). 2000 is over 5 years of days.
+MAX_BUCKETS = 2000
+MAX_VENDOR_BUCKETS = 100000
+
+
+def bucket_starts(start, end, granularity):
+    """Start date of every bucket between start and end, as a datetime64[D] array"""
+    if granularity == 'month':
+        months = np.arange(np.datetime64(start, 'M'), np.datetime64(end, 'M') + 1)
+        return months.astype('datetime64[D]')
+    step = 7 if granularity == 'week' else 1
+    # Weeks start on Monday, same as TruncWeek
+    first = start - timedelta(days=start.weekday()) if granularity == 'week' else start
+    return np.arange(np.datetime64(first, 'D'), np.datetime64(end, 'D') + 1, step)
+
+
+def timeline_vendor_count(start, end, vendor_id=None):
+    """How many vendors a by_vendor timeline would have rows for"""
+    services = Service.objects.filter(
+        Q(payment_due_date__range=[start, end], status__in=['active', 'payment_pending'])
+        | Q(expiry_date__range=[start, end])
+    )
+    archived = ArchivedService.objects.filter(expiry_date__range=[start, end])
+    if vendor_id is not None:
+        services = services.filter(vendor_id=vendor_id)
+        archived = archived.filter(vendor_id=vendor_id)
+    # UNION drops the vendors that are in both
+    return services.order_by().values('vendor_id').union(archived.order_by().values('vendor_id')).count()
+
+
+def rolling_mean(values, window):
+    """Trailing mean over the last `window` buckets along the last axis
+    
+    The first few buckets average over however many buckets there are so far.
+    """
+    window = max(1, min(window, values.shape[-1]))
+    totals = np.cumsum(values, axis=-1)
+    shifted = np.zeros_like(totals)
+    shifted[..., window:] = totals[..., :-window]
+    counts = np.minimum(np.arange(1, values.shape[-1] + 1), window)
+    return (totals - shifted) / counts
+
+
+def linear_forecast(values, periods):
+    """Extend each row by `periods` buckets using a least-squares linear trend"""
+    n = values.shape[-1]
+    if n == 0 or periods <= 0:
+        return np.zeros(values.shape[:-1] + (max(periods, 0),))
+    x = np.arange(n, dtype=float)
+    x_mean = x.mean()
+    y_mean = values.mean(axis=-1, keepdims=True)
+    spread = ((x - x_mean) ** 2).sum()
+    slope = ((x - x_mean) * (values - y_mean)).sum(axis=-1, keepdims=True) / spread if spread else 0.0
+    future = np.arange(n, n + periods, dtype=float)
+    # Amounts can't go negative
+    return np.maximum(y_mean + slope * (future - x_mean), 0.0)
+
+
+def _bucketed_rows(queryset, date_field, granularity, by_vendor, **aggregates):
+    group_by = ['bucket', 'vendor_id'] if by_vendor else ['bucket']
+    return (
+        queryset
+        .annotate(bucket=TRUNC_FUNCTIONS[granularity](date_field))
+        .values(*group_by)
+        .annotate(**aggregates)
+        .order_by()
+    )
+
+
+def build_timeline(start, end, granularity='month', vendor_id=None, by_vendor=False,
+                   window=3, forecast=3):
+    """Time-bucketed payments due, expiring contracts and overdue value
+    
+    Bucketing and sums happen in SQL (one query per date column, plus one for
+    archived contracts), then the buckets are laid out as NumPy arrays for the
+    rolling and forecast figures.
+    """
+    today = timezone.now().date()
+    services = Service.objects.all()
+    archived = ArchivedService.objects.all()
+    if vendor_id is not None:
+        services = services.filter(vendor_id=vendor_id)
+        archived = archived.filter(vendor_id=vendor_id)
+    
+    payment_rows = _bucketed_rows(
+        services.filter(
+            payment_due_date__range=[start, end],
+            status__in=['active', 'payment_pending']
+        ),
+        'payment_due_date', granularity, by_vendor,
+        payments_due=Sum('amount'),
+        payments_due_count=Count('id'),
+        overdue=Sum('amount', filter=Q(payment_due_date__lt=today)),
+    )
+    expiry_rows = _bucketed_rows(
+        services.filter(expiry_date__range=[start, end]),
+        'expiry_date', granularity, by_vendor,
+        expiring_count=Count('id'),
+        expiring_value=Sum('amount'),
+    )
+    # Old completed/expired contracts have been archived. They never count as
+    # payments due (wrong status), but they did expire.
+    archived_expiry_rows = _bucketed_rows(
+        archived.filter(expiry_date__range=[start, end]),
+        'expiry_date', granularity, by_vendor,
+        expiring_count=Count('id'),
+        expiring_value=Sum('amount'),
+    )
+    payment_rows = list(payment_rows)
+    expiry_rows = list(expiry_rows) + list(archived_expiry_rows)
+    
+    buckets = bucket_starts(start, end, granularity)
+    if by_vendor:
+        vendor_ids = sorted({row['vendor_id'] for row in payment_rows + expiry_rows})
+    else:
+        vendor_ids = [None]
+    row_index = {vendor: i for i, vendor in enumerate(vendor_ids)}
+    
+    names = ['payments_due', 'payments_due_count', 'overdue', 'expiring_count', 'expiring_value']
+    arrays = {name: np.zeros((len(vendor_ids), len(buckets))) for name in names}
+    
+    for rows, columns in (
+        (payment_rows, ['payments_due', 'payments_due_count', 'overdue']),
+        (expiry_rows, ['expiring_count', 'expiring_value']),
+    ):
+        if not rows:
+            continue
+        rows_at = np.array([row_index[row.get('vendor_id')] for row in rows])
+        cols_at = np.searchsorted(buckets, np.array([row['bucket'] for row in rows], dtype='datetime64[D]'))
+        for name in columns:
+            # add.at, a bucket can have a row for live and one for archived services
+            np.add.at(arrays[name], (rows_at, cols_at), np.array([float(row[name] or 0) for row in rows]))
+    
+    rolling = {name: rolling_mean(arrays[name], window) for name in AMOUNT_SERIES}
+    forecasts = {name: linear_forecast(arrays[name], forecast) for name in AMOUNT_SERIES}
+    
+    def payload(select):
+        # select picks a row (one vendor) or sums all rows (overall)
+        return {
+            'series': {name: np.round(select(arrays[name]), 2).tolist() for name in names},
+            'rolling': {name: np.round(select(values), 2).tolist() for name, values in rolling.items()},
+            'forecast': {name: np.round(select(values), 2).tolist() for name, values in forecasts.items()},
+        }
+    
+    timeline = {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'granularity': granularity,
+        'window': window,
+        'buckets': [str(bucket) for bucket in buckets],
+        'overall': payload(lambda values: values.sum(axis=0)),
+    }
+    if by_vendor:
+        timeline['vendors'] = {
+            str(vendor): payload(lambda values, i=i: values[i])
+            for vendor, i in row_index.items()
+        }
+    return timeline
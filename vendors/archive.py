@@ -0,0 +1,66 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .dashboard_cache import invalidate_on_commit
+from .models import ArchivedService, Service
+from .signals import services_archived
+
+# Services in these states never change again, so they can be moved out
+ARCHIVABLE_STATUSES = ['completed', 'expired']
+
+# Columns copied across as-is (vendor_id, created_by_id etc)
+ARCHIVED_COLUMNS = [field.attname for field in Service._meta.concrete_fields]
+
+
+def archivable_services(older_than_days=None):
+    """Completed/expired services whose expiry date is older than the cutoff"""
+    if older_than_days is None:
+        older_than_days = settings.ARCHIVE_AFTER_DAYS
+    cutoff = timezone.now().date() - timedelta(days=older_than_days)
+    return Service.objects.filter(
+        status__in=ARCHIVABLE_STATUSES,
+        expiry_date__lt=cutoff
+    )
+
+
+def archive_services(older_than_days=None, batch_size=None, max_batches=None):
+    """Move old services into the archive table, one bounded batch per transaction
+    
+    Returns how many services were archived.
+    """
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    archived = 0
+    batches = 0
+    
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            # skip_locked so we don't wait on rows someone is editing right now
+            rows = list(
+                archivable_services(older_than_days)
+                .order_by('id')
+                .select_for_update(skip_locked=True)
+                .values(*ARCHIVED_COLUMNS)[:batch_size]
+            )
+            if not rows:
+                break
+            
+            ArchivedService.objects.bulk_create(
+                [ArchivedService(**row) for row in rows],
+                ignore_conflicts=True
+            )
+            ids = [row['id'] for row in rows]
+            # The rows live on in the archive table, so this isn't a delete as
+            # far as signals go: one plain DELETE, then services_archived
+            Service.objects.filter(id__in=ids)._raw_delete(Service.objects.db)
+            services_archived.send(sender=Service, ids=ids)
+            invalidate_on_commit()
+        
+        archived += len(rows)
+        batches += 1
+        if len(rows) < batch_size:
+            break
+    
+    return archived
@@ -0,0 +1,51 @@
+# Version number for the cached dashboard results
+# The dashboard caches are keyed by this version and it goes up after any
+# vendor or service change commits, so the next request recomputes instead of
+# showing old numbers for up to DASHBOARD_CACHE_TIMEOUT seconds.
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Service, Vendor
+from .signals import services_status_changed
+
+VERSION_KEY = 'dashboard:version'
+
+
+def _initial_version():
+    # If the key was evicted, start above anything handed out before
+    return int(time.time() * 1000)
+
+
+def dashboard_cache_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, _initial_version(), None)
+        version = cache.get(VERSION_KEY, _initial_version())
+    return version
+
+
+def invalidate_dashboard_cache():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, _initial_version(), None)
+
+
+def invalidate_on_commit():
+    # After commit, so a request in between can't cache the old numbers again
+    transaction.on_commit(invalidate_dashboard_cache)
+
+
+@receiver([post_save, post_delete], sender=Vendor)
+@receiver([post_save, post_delete], sender=Service)
+def model_changed(sender, **kwargs):
+    invalidate_on_commit()
+
+
+@receiver(services_status_changed)
+def statuses_changed(sender, **kwargs):
+    invalidate_on_commit()
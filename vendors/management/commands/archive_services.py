@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from vendors.archive import archivable_services, archive_services
+
+
+class Command(BaseCommand):
+    help = 'Move old completed/expired services into the archive table in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days',
+            type=int,
+            default=settings.ARCHIVE_AFTER_DAYS,
+            help='Only archive services that expired more than this many days ago.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.ARCHIVE_BATCH_SIZE,
+            help='How many services to move per transaction.',
+        )
+        parser.add_argument(
+            '--max-batches',
+            type=int,
+            default=None,
+            help='Stop after this many batches (default: run until nothing is left).',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count how many services would be archived.',
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            count = archivable_services(options['older_than_days']).count()
+            self.stdout.write(f'{count} services would be archived')
+            return
+
+        archived = archive_services(
+            older_than_days=options['older_than_days'],
+            batch_size=options['batch_size'],
+            max_batches=options['max_batches'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Archived {archived} services'))
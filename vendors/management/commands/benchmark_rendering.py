@@ -0,0 +1,60 @@
+import timeit
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.text import compress_string
+from rest_framework.renderers import JSONRenderer
+
+from vendor_management_backend.middleware import brotli
+from vendor_management_backend.renderers import ORJSONRenderer
+from vendors.models import Service, Vendor
+from vendors.serializers import ServiceSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compare JSON encode time and bytes on the wire for a large service list'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--services', type=int, default=5000, help='How many services to render.')
+        parser.add_argument('--repeat', type=int, default=5, help='Timing runs per renderer (best is kept).')
+
+    def build_data(self, count):
+        # Unsaved objects, so this doesn't need a database
+        now = timezone.now()
+        user = User(id=1, username='bench', email='bench@example.com', first_name='Bench', last_name='User')
+        vendor = Vendor(id=1, name='Bench Vendor', contact_person='Bench', email='vendor@example.com')
+        services = [
+            Service(
+                id=i,
+                vendor=vendor,
+                service_name=f'Service {i}',
+                start_date=date(2025, 1, 1),
+                expiry_date=date(2025, 1, 1) + timedelta(days=30 + i % 700),
+                payment_due_date=date(2025, 1, 1) + timedelta(days=15 + i % 365),
+                amount=Decimal('1000.00') + i,
+                status='active',
+                created_at=now,
+                updated_at=now,
+                created_by=user,
+            )
+            for i in range(1, count + 1)
+        ]
+        return ServiceSerializer(services, many=True).data
+
+    def handle(self, *args, **options):
+        data = self.build_data(options['services'])
+        self.stdout.write(f"Rendering {options['services']} services, best of {options['repeat']} runs\n")
+
+        for name, renderer in (('stdlib json', JSONRenderer()), ('orjson', ORJSONRenderer())):
+            body = renderer.render(data)
+            seconds = min(timeit.repeat(lambda: renderer.render(data), number=1, repeat=options['repeat']))
+            self.stdout.write(f'{name:12} encode {seconds * 1000:8.1f} ms   {len(body):>10,} bytes')
+
+            gzip_body = compress_string(body)
+            self.stdout.write(f'{"":12} gzip   {len(gzip_body):>10,} bytes ({len(gzip_body) / len(body):.0%})')
+            if brotli is not None:
+                br_body = brotli.compress(body, quality=4)
+                self.stdout.write(f'{"":12} br     {len(br_body):>10,} bytes ({len(br_body) / len(body):.0%})')
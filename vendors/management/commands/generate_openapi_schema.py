@@ -0,0 +1,23 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from vendor_management_backend.schema import generate_schema, schema_format
+
+
+class Command(BaseCommand):
+    help = 'Generate the OpenAPI schema once and write it to a static file'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            default=None,
+            help='Where to write the schema (.json or .yaml). Defaults to OPENAPI_SCHEMA_PATH.',
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options['output'] or settings.OPENAPI_SCHEMA_PATH)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(generate_schema(schema_format(path)))
+        self.stdout.write(self.style.SUCCESS(f'Wrote OpenAPI schema to {path}'))
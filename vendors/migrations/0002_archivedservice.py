@@ -0,0 +1,69 @@
+# Generated by Django 5.0.2 on 2026-10-19 09:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("vendors", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="service",
+            index=models.Index(
+                fields=["status", "expiry_date"], name="service_status_expiry_idx"
+            ),
+        ),
+        migrations.CreateModel(
+            name="ArchivedService",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("service_name", models.CharField(max_length=200)),
+                ("start_date", models.DateField()),
+                ("expiry_date", models.DateField()),
+                ("payment_due_date", models.DateField()),
+                ("amount", models.DecimalField(decimal_places=2, max_digits=12)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("active", "Active"),
+                            ("expired", "Expired"),
+                            ("payment_pending", "Payment Pending"),
+                            ("completed", "Completed"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("created_at", models.DateTimeField()),
+                ("updated_at", models.DateTimeField()),
+                ("archived_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archived_services",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "vendor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archived_services",
+                        to="vendors.vendor",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Archived Service",
+                "verbose_name_plural": "Archived Services",
+                "ordering": ["-created_at"],
+            },
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.0.2 on 2026-10-19 10:05
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def check_duplicate_emails(apps, schema_editor):
+    """Stop with a readable list instead of an IntegrityError from AddConstraint
+
+    Emails used to be unique only as an exact match checked by the API, so
+    existing rows can differ just by case (or be exact duplicates written
+    some other way). Those have to be fixed by hand before migrating.
+    """
+    Vendor = apps.get_model("vendors", "Vendor")
+    duplicates = list(
+        Vendor.objects.annotate(email_lower=Lower("email"))
+        .values("email_lower")
+        .annotate(count=Count("id"))
+        .filter(count__gt=1)
+        .values_list("email_lower", flat=True)
+    )
+    if not duplicates:
+        return
+    lines = []
+    for email in duplicates:
+        vendors = Vendor.objects.annotate(email_lower=Lower("email")).filter(email_lower=email)
+        lines.append(
+            f"  {email}: "
+            + ", ".join(f"id={vendor.id} ({vendor.email})" for vendor in vendors.order_by("id"))
+        )
+    raise RuntimeError(
+        "Vendor emails must be unique ignoring case. Change or merge these "
+        "vendors, then run the migration again:\n" + "\n".join(lines)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("vendors", "0002_archivedservice"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="vendor",
+            name="name",
+            field=models.CharField(max_length=200),
+        ),
+        migrations.AlterUniqueTogether(
+            name="service",
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name="vendor",
+            constraint=models.UniqueConstraint(
+                fields=("name",), name="vendor_name_unique"
+            ),
+        ),
+        migrations.RunPython(check_duplicate_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="vendor",
+            constraint=models.UniqueConstraint(
+                django.db.models.functions.text.Lower("email"),
+                name="vendor_email_ci_unique",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="service",
+            constraint=models.UniqueConstraint(
+                fields=("vendor", "service_name", "start_date"),
+                name="service_vendor_name_start_unique",
+            ),
+        ),
+    ]
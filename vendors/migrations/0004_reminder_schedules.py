@@ -0,0 +1,138 @@
+# Generated by Django 5.0.2 on 2026-10-19 11:20
+
+from datetime import datetime, time, timedelta
+
+import django.core.validators
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+REMINDER_DAYS_HELP = "Days before expiry/payment due to send reminders, e.g. 30,15,7,1. Leave blank for the default."
+
+
+# Copies of the vendors.reminders helpers as they were when this migration
+# was written, so later changes there don't change what it does
+
+
+def parse_reminder_days(value):
+    if not value:
+        return []
+    days = {int(day) for day in str(value).split(",") if day.strip()}
+    return sorted((day for day in days if day >= 0), reverse=True)
+
+
+def default_reminder_days():
+    return parse_reminder_days(getattr(settings, "REMINDER_DAYS", "15")) or [15]
+
+
+def reminder_targets(expiry_date, payment_due_date, status):
+    targets = []
+    if status == "active":
+        targets.append(("expiry", expiry_date))
+    if status in ("active", "payment_pending"):
+        targets.append(("payment", payment_due_date))
+    return targets
+
+
+def next_notification_date(targets, schedule, last_notified_on, today):
+    candidates = []
+    for kind, target in targets:
+        if target < today:
+            continue
+        for days in schedule:
+            reminder_date = target - timedelta(days=days)
+            if last_notified_on is not None and reminder_date <= last_notified_on:
+                continue
+            candidates.append(max(reminder_date, today))
+    return min(candidates) if candidates else None
+
+
+def start_of_day(day):
+    if day is None:
+        return None
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def set_next_notification(apps, schema_editor):
+    Service = apps.get_model("vendors", "Service")
+    today = timezone.now().date()
+    services = Service.objects.filter(
+        status__in=["active", "payment_pending"], payment_due_date__gte=today
+    ) | Service.objects.filter(status="active", expiry_date__gte=today)
+
+    batch = []
+    for service in services.select_related("vendor").iterator(chunk_size=500):
+        schedule = (
+            parse_reminder_days(service.reminder_days)
+            or parse_reminder_days(service.vendor.reminder_days)
+            or default_reminder_days()
+        )
+        next_date = next_notification_date(
+            reminder_targets(service.expiry_date, service.payment_due_date, service.status),
+            schedule,
+            service.last_notified_on,
+            today,
+        )
+        service.next_notification_at = start_of_day(next_date)
+        batch.append(service)
+        if len(batch) >= 500:
+            Service.objects.bulk_update(batch, ["next_notification_at"])
+            batch = []
+    if batch:
+        Service.objects.bulk_update(batch, ["next_notification_at"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("vendors", "0003_unique_constraints"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="vendor",
+            name="reminder_days",
+            field=models.CharField(
+                blank=True,
+                help_text=REMINDER_DAYS_HELP,
+                max_length=100,
+                validators=[django.core.validators.validate_comma_separated_integer_list],
+            ),
+        ),
+        migrations.AddField(
+            model_name="service",
+            name="reminder_days",
+            field=models.CharField(
+                blank=True,
+                help_text=REMINDER_DAYS_HELP,
+                max_length=100,
+                validators=[django.core.validators.validate_comma_separated_integer_list],
+            ),
+        ),
+        migrations.AddField(
+            model_name="service",
+            name="next_notification_at",
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="service",
+            name="last_notified_on",
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="archivedservice",
+            name="reminder_days",
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name="archivedservice",
+            name="next_notification_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="archivedservice",
+            name="last_notified_on",
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.RunPython(set_next_notification, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 5.0.2 on 2026-10-19 17:30
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("vendors", "0004_reminder_schedules"),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name="ServiceReminder",
+        ),
+    ]
@@ -1,11 +1,40 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.core.validators import EmailValidator
+from django.core.validators import EmailValidator, validate_comma_separated_integer_list
+from django.db import transaction
+from django.db.models.functions import Lower
 from django.utils import timezone
-from datetime import timedelta
+from .reminders import (
+    default_reminder_days, next_notification_date, parse_reminder_days,
+    reminder_targets, reminder_window_days, start_of_day
+)
 
+REMINDER_DAYS_HELP = "Days before expiry/payment due to send reminders, e.g. 30,15,7,1. Leave blank for the default."
 
-class Vendor(models.Model):
+
+class LoadedValuesMixin:
+    """Remembers the column values a row was loaded with
+    
+    Lets save() (and the audit log) see what changed without another query.
+    """
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # What's in the database now, for the next save
+        self._loaded_values = {
+            field.attname: self.__dict__[field.attname]
+            for field in self._meta.concrete_fields
+            if field.attname in self.__dict__
+        }
+
+
+class Vendor(LoadedValuesMixin, models.Model):
     """Represents a vendor/company we work with"""
     
     STATUS_CHOICES = [
@@ -13,7 +42,7 @@ class Vendor(models.Model):
         ('inactive', 'Inactive'),
     ]
     
-    name = models.CharField(max_length=200, unique=True)
+    name = models.CharField(max_length=200)
     contact_person = models.CharField(max_length=100)
     email = models.EmailField(validators=[EmailValidator()])
     phone = models.CharField(max_length=20)
@@ -21,18 +50,40 @@ class Vendor(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_vendors')
+    reminder_days = models.CharField(
+        max_length=100, blank=True,
+        validators=[validate_comma_separated_integer_list],
+        help_text=REMINDER_DAYS_HELP
+    )
     
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Vendor'
         verbose_name_plural = 'Vendors'
+        # Uniqueness is enforced here rather than with queries in the serializer
+        constraints = [
+            models.UniqueConstraint(fields=['name'], name='vendor_name_unique'),
+            models.UniqueConstraint(Lower('email'), name='vendor_email_ci_unique'),
+        ]
     
     def __str__(self):
         return self.name
     
+    def save(self, *args, **kwargs):
+        loaded = getattr(self, '_loaded_values', {})
+        schedule_changed = (
+            'reminder_days' in loaded
+            and self.__dict__.get('reminder_days', loaded['reminder_days']) != loaded['reminder_days']
+        )
+        super().save(*args, **kwargs)
+        
+        if schedule_changed:
+            # Services using the vendor's schedule need their next reminder moved
+            from .tasks import refresh_vendor_reminders
+            transaction.on_commit(lambda: refresh_vendor_reminders.delay(self.pk))
 
 
-class Service(models.Model):
+class Service(LoadedValuesMixin, models.Model):
     """Represents a service/contract with a vendor"""
     
     STATUS_CHOICES = [
@@ -52,12 +103,30 @@ class Service(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_services')
+    reminder_days = models.CharField(
+        max_length=100, blank=True,
+        validators=[validate_comma_separated_integer_list],
+        help_text=REMINDER_DAYS_HELP
+    )
+    # When the next reminder should go out, kept up to date on save and after
+    # each send so the reminder scan is a single index range lookup
+    next_notification_at = models.DateTimeField(null=True, blank=True, db_index=True, editable=False)
+    last_notified_on = models.DateField(null=True, blank=True, editable=False)
     
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Service'
         verbose_name_plural = 'Services'
-        unique_together = ['vendor', 'service_name', 'start_date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['vendor', 'service_name', 'start_date'],
+                name='service_vendor_name_start_unique'
+            ),
+        ]
+        indexes = [
+            # Used by the archival scan and the expiring soon lookups
+            models.Index(fields=['status', 'expiry_date'], name='service_status_expiry_idx'),
+        ]
     
     def __str__(self):
         return f"{self.vendor.name} - {self.service_name}"
@@ -76,13 +145,33 @@ class Service(models.Model):
     
     @property
     def is_expiring_soon(self):
-        """Check if service expires within 15 days"""
-        return self.days_until_expiry <= 15 and self.days_until_expiry >= 0
+        """Check if service expires within the reminder window"""
+        return 0 <= self.days_until_expiry <= reminder_window_days()
     
     @property
     def is_payment_due_soon(self):
-        """Check if payment is due within 15 days"""
-        return self.days_until_payment_due <= 15 and self.days_until_payment_due >= 0
+        """Check if payment is due within the reminder window"""
+        return 0 <= self.days_until_payment_due <= reminder_window_days()
+    
+    @property
+    def reminder_schedule(self):
+        """The service's own schedule, else the vendor's, else the default"""
+        return (
+            parse_reminder_days(self.reminder_days)
+            or parse_reminder_days(self.vendor.reminder_days)
+            or default_reminder_days()
+        )
+    
+    def refresh_next_notification(self, today=None):
+        """Work out next_notification_at from the dates, status and schedule"""
+        today = today or timezone.now().date()
+        next_date = next_notification_date(
+            reminder_targets(self.expiry_date, self.payment_due_date, self.status),
+            self.reminder_schedule,
+            self.last_notified_on,
+            today
+        )
+        self.next_notification_at = start_of_day(next_date)
     
     def save(self, *args, **kwargs):
         """Auto-update status based on dates when saving"""
@@ -91,5 +180,40 @@ class Service(models.Model):
             self.status = 'expired'
         elif self.payment_due_date < today and self.status == 'active':
             self.status = 'payment_pending'
+        
+        self.refresh_next_notification(today)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'status', 'next_notification_at'}
         super().save(*args, **kwargs)
 
+
+class ArchivedService(models.Model):
+    """A completed or expired service moved out of the services table
+    
+    Keeps the original id and the same columns (in the same order) as Service,
+    so the two tables can be queried together with union().
+    """
+    
+    id = models.BigIntegerField(primary_key=True)
+    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE, related_name='archived_services')
+    service_name = models.CharField(max_length=200)
+    start_date = models.DateField()
+    expiry_date = models.DateField()
+    payment_due_date = models.DateField()
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    status = models.CharField(max_length=20, choices=Service.STATUS_CHOICES)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_services')
+    reminder_days = models.CharField(max_length=100, blank=True)
+    next_notification_at = models.DateTimeField(null=True, blank=True)
+    last_notified_on = models.DateField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Archived Service'
+        verbose_name_plural = 'Archived Services'
+    
+    def __str__(self):
+        return f"{self.vendor.name} - {self.service_name} (archived)"
@@ -0,0 +1,76 @@
+# Reminder schedule helpers
+# A schedule is a list of "days before" thresholds, e.g. [30, 15, 7, 1]. Each
+# service has an expiry and a payment due date, a reminder is due for a date
+# once one of its thresholds has been reached since the last reminder.
+# These are plain functions (no model imports) so models and views can share them.
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+# Which statuses get which reminders
+REMINDER_STATUSES = {
+    'expiry': ['active'],
+    'payment': ['active', 'payment_pending'],
+}
+
+
+def parse_reminder_days(value):
+    """'30,15,7,1' -> [30, 15, 7, 1], blank -> []"""
+    if not value:
+        return []
+    days = {int(day) for day in str(value).split(',') if day.strip()}
+    return sorted((day for day in days if day >= 0), reverse=True)
+
+
+def default_reminder_days():
+    return parse_reminder_days(settings.REMINDER_DAYS) or [15]
+
+
+def reminder_window_days():
+    """How far ahead 'expiring soon' and 'payment due soon' look"""
+    return max(default_reminder_days())
+
+
+def reminder_targets(expiry_date, payment_due_date, status):
+    """(kind, date) pairs this service can get reminders for"""
+    dates = {'expiry': expiry_date, 'payment': payment_due_date}
+    return [(kind, dates[kind]) for kind, statuses in REMINDER_STATUSES.items() if status in statuses]
+
+
+def due_reminder_kinds(targets, schedule, last_notified_on, today):
+    """Kinds with a threshold reached after the last reminder and by today"""
+    kinds = []
+    for kind, target in targets:
+        if target < today:
+            continue
+        for days in schedule:
+            reminder_date = target - timedelta(days=days)
+            if reminder_date <= today and (last_notified_on is None or reminder_date > last_notified_on):
+                kinds.append(kind)
+                break
+    return kinds
+
+
+def next_notification_date(targets, schedule, last_notified_on, today):
+    """Date of the next reminder, or None if there's nothing left to send
+
+    Thresholds that were missed (e.g. the service was created inside the
+    window) are due today.
+    """
+    candidates = []
+    for kind, target in targets:
+        if target < today:
+            continue
+        for days in schedule:
+            reminder_date = target - timedelta(days=days)
+            if last_notified_on is not None and reminder_date <= last_notified_on:
+                continue
+            candidates.append(max(reminder_date, today))
+    return min(candidates) if candidates else None
+
+
+def start_of_day(day):
+    if day is None:
+        return None
+    return timezone.make_aware(datetime.combine(day, time.min))
@@ -1,15 +1,152 @@
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
 from .models import Vendor, Service
 
 
+SERVICE_UNIQUE_MESSAGE = "The fields vendor, service_name, start_date must make a unique set."
+
+
+class UniqueConstraintErrorsMixin:
+    """Turn unique constraint violations into normal validation errors
+    
+    Uniqueness is left to the database instead of checking with an exists()
+    query first, so this maps the constraint that failed back to a field.
+    """
+    
+    # constraint name -> (field, message)
+    unique_constraint_errors = {}
+    
+    def _violated_constraint(self, exc):
+        diag = getattr(exc.__cause__, 'diag', None)
+        if diag is not None and diag.constraint_name:
+            return diag.constraint_name
+        
+        # Other backends only have the message. It names the constraint
+        # (MySQL, SQLite expression indexes) or lists its columns as
+        # table.column (SQLite field constraints).
+        message = str(exc)
+        failed_columns = set()
+        if 'UNIQUE constraint failed:' in message:
+            failed_columns = {
+                column.strip() for column in message.split('UNIQUE constraint failed:', 1)[1].split(',')
+            }
+        opts = self.Meta.model._meta
+        for constraint in opts.constraints:
+            if constraint.name not in self.unique_constraint_errors:
+                continue
+            if constraint.name in message:
+                return constraint.name
+            columns = {
+                f'{opts.db_table}.{opts.get_field(field).column}'
+                for field in getattr(constraint, 'fields', ())
+            }
+            if columns and columns == failed_columns:
+                return constraint.name
+        return None
+    
+    def _save_checking_constraints(self, save, *args):
+        try:
+            # Savepoint so a violation doesn't break an outer transaction
+            with transaction.atomic():
+                return save(*args)
+        except IntegrityError as exc:
+            constraint = self._violated_constraint(exc)
+            if constraint not in self.unique_constraint_errors:
+                raise
+            field, message = self.unique_constraint_errors[constraint]
+            raise serializers.ValidationError({field: [message]})
+    
+    def create(self, validated_data):
+        return self._save_checking_constraints(super().create, validated_data)
+    
+    def update(self, instance, validated_data):
+        return self._save_checking_constraints(super().update, instance, validated_data)
+
+
+def _query_param_list(request, name):
+    """Comma separated query param as a list, or None if it wasn't given"""
+    if request is None or request.method != 'GET' or name not in request.query_params:
+        return None
+    return [item.strip() for item in request.query_params[name].split(',') if item.strip()]
+
+
+class DynamicFieldsMixin:
+    """Lets GET requests pick fields with ?fields= and nested objects with ?expand=
+    
+    Expandable fields are rendered in full by default. Once ?expand= is given,
+    the expandable fields not listed in it are rendered as primary keys.
+    """
+    
+    # field name -> factory for the collapsed (primary key) version
+    expandable_fields = {}
+    # field name -> queryset tweak that loads what the field needs
+    expanded_loaders = {}
+    collapsed_loaders = {}
+    # computed field -> model fields it reads
+    field_sources = {}
+    
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        expand = kwargs.pop('expand', None)
+        super().__init__(*args, **kwargs)
+        
+        request = self.context.get('request')
+        if fields is None:
+            fields = _query_param_list(request, 'fields')
+        if expand is None:
+            expand = _query_param_list(request, 'expand')
+        
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        if expand is not None:
+            for name, collapsed in self.expandable_fields.items():
+                if name in self.fields and name not in expand:
+                    self.fields[name] = collapsed()
+    
+    @classmethod
+    def requested_fields(cls, request):
+        """(fields that will be rendered, expandable fields rendered in full)"""
+        fields = _query_param_list(request, 'fields')
+        expand = _query_param_list(request, 'expand')
+        names = [name for name in cls.Meta.fields if fields is None or name in fields]
+        expanded = {
+            name for name in cls.expandable_fields
+            if name in names and (expand is None or name in expand)
+        }
+        return names, expanded
+    
+    @classmethod
+    def optimize_queryset(cls, queryset, request, extra_columns=()):
+        """Only load the columns and relations the requested fields need"""
+        names, expanded = cls.requested_fields(request)
+        model_fields = {field.name for field in cls.Meta.model._meta.concrete_fields}
+        
+        columns = {'id', *extra_columns}
+        for name in names:
+            if name in cls.field_sources:
+                columns.update(cls.field_sources[name])
+            elif name in model_fields:
+                columns.add(name)
+        
+        queryset = queryset.select_related(None).prefetch_related(None).only(*columns)
+        for name in names:
+            loaders = cls.expanded_loaders if name in expanded else cls.collapsed_loaders
+            if name in loaders:
+                queryset = loaders[name](queryset)
+        return queryset
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name']
 
 
-class ServiceSerializer(serializers.ModelSerializer):
+class ServiceSerializer(DynamicFieldsMixin, UniqueConstraintErrorsMixin, serializers.ModelSerializer):
     days_until_expiry = serializers.ReadOnlyField()
     days_until_payment_due = serializers.ReadOnlyField()
     is_expiring_soon = serializers.ReadOnlyField()
@@ -22,12 +159,32 @@ class ServiceSerializer(serializers.ModelSerializer):
             'id', 'vendor', 'service_name', 'start_date', 'expiry_date',
             'payment_due_date', 'amount', 'status', 'created_at', 'updated_at',
             'created_by', 'days_until_expiry', 'days_until_payment_due',
-            'is_expiring_soon', 'is_payment_due_soon'
+            'is_expiring_soon', 'is_payment_due_soon', 'reminder_days',
+            'next_notification_at'
         ]
-        read_only_fields = ['created_at', 'updated_at', 'created_by']
+        read_only_fields = ['created_at', 'updated_at', 'created_by', 'next_notification_at']
+        # Checked by the database constraint instead of an extra query
+        validators = []
+    
+    unique_constraint_errors = {
+        'service_vendor_name_start_unique': (api_settings.NON_FIELD_ERRORS_KEY, SERVICE_UNIQUE_MESSAGE),
+    }
+    
+    expandable_fields = {
+        'created_by': lambda: serializers.PrimaryKeyRelatedField(read_only=True),
+    }
+    expanded_loaders = {
+        'created_by': lambda queryset: queryset.select_related('created_by'),
+    }
+    field_sources = {
+        'days_until_expiry': ['expiry_date'],
+        'days_until_payment_due': ['payment_due_date'],
+        'is_expiring_soon': ['expiry_date'],
+        'is_payment_due_soon': ['payment_due_date'],
+    }
 
 
-class VendorSerializer(serializers.ModelSerializer):
+class VendorSerializer(DynamicFieldsMixin, UniqueConstraintErrorsMixin, serializers.ModelSerializer):
     services = ServiceSerializer(many=True, read_only=True)
     created_by = UserSerializer(read_only=True)
     
@@ -35,38 +192,44 @@ class VendorSerializer(serializers.ModelSerializer):
         model = Vendor
         fields = [
             'id', 'name', 'contact_person', 'email', 'phone', 'status',
-            'created_at', 'updated_at', 'created_by', 'services'
+            'created_at', 'updated_at', 'created_by', 'reminder_days', 'services'
         ]
         read_only_fields = ['created_at', 'updated_at', 'created_by']
+        # Checked by the database constraint instead of an extra query
+        extra_kwargs = {'name': {'validators': []}}
     
-    def validate_email(self, value):
-        # Make sure email is unique
-        if self.instance:
-            if Vendor.objects.filter(email=value).exclude(pk=self.instance.pk).exists():
-                raise serializers.ValidationError("This email is already in use by another vendor.")
-        else:
-            if Vendor.objects.filter(email=value).exists():
-                raise serializers.ValidationError("This email is already in use by another vendor.")
-        return value
+    unique_constraint_errors = {
+        'vendor_email_ci_unique': ('email', "This email is already in use by another vendor."),
+        'vendor_name_unique': ('name', "A vendor with this name already exists."),
+    }
     
-    def validate_name(self, value):
-        # Make sure vendor name is unique
-        if self.instance:
-            if Vendor.objects.filter(name=value).exclude(pk=self.instance.pk).exists():
-                raise serializers.ValidationError("A vendor with this name already exists.")
-        else:
-            if Vendor.objects.filter(name=value).exists():
-                raise serializers.ValidationError("A vendor with this name already exists.")
-        return value
+    expandable_fields = {
+        'created_by': lambda: serializers.PrimaryKeyRelatedField(read_only=True),
+        'services': lambda: serializers.PrimaryKeyRelatedField(many=True, read_only=True),
+    }
+    expanded_loaders = {
+        'created_by': lambda queryset: queryset.select_related('created_by'),
+        'services': lambda queryset: queryset.prefetch_related(
+            Prefetch('services', queryset=Service.objects.select_related('created_by'))
+        ),
+    }
+    collapsed_loaders = {
+        'services': lambda queryset: queryset.prefetch_related(
+            Prefetch('services', queryset=Service.objects.only('id', 'vendor'))
+        ),
+    }
 
 
-class ServiceCreateSerializer(serializers.ModelSerializer):
+class ServiceCreateSerializer(UniqueConstraintErrorsMixin, serializers.ModelSerializer):
     class Meta:
         model = Service
         fields = [
             'vendor', 'service_name', 'start_date', 'expiry_date',
-            'payment_due_date', 'amount', 'status'
+            'payment_due_date', 'amount', 'status', 'reminder_days'
         ]
+        validators = []
+    
+    unique_constraint_errors = ServiceSerializer.unique_constraint_errors
     
     def validate(self, data):
         # Check dates make sense
@@ -79,7 +242,7 @@ class ServiceCreateSerializer(serializers.ModelSerializer):
         return data
 
 
-class VendorListSerializer(serializers.ModelSerializer):
+class VendorListSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Vendor
         fields = [
@@ -98,3 +261,37 @@ class ServiceStatusUpdateSerializer(serializers.ModelSerializer):
         if value not in valid_statuses:
             raise serializers.ValidationError(f"Invalid status. Must be one of: {', '.join(valid_statuses)}")
         return value
+
+
+class ServiceBatchItemSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    # The updated_at the client last saw, the row is skipped if it changed since
+    updated_at = serializers.DateTimeField(required=False, allow_null=True)
+
+
+# Most services one batch status update may change, whichever way they're picked
+BATCH_STATUS_MAX_SERVICES = 1000
+
+
+class ServiceBatchFilterSerializer(serializers.Serializer):
+    vendor = serializers.IntegerField(required=False)
+    status = serializers.ChoiceField(choices=Service.STATUS_CHOICES, required=False)
+    expiry_date_before = serializers.DateField(required=False)
+    payment_due_date_before = serializers.DateField(required=False)
+
+
+class ServiceBatchStatusSerializer(serializers.Serializer):
+    """Pick the services by ids, by items (ids + updated_at) or by filter"""
+    
+    status = serializers.ChoiceField(choices=Service.STATUS_CHOICES)
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, max_length=BATCH_STATUS_MAX_SERVICES)
+    items = ServiceBatchItemSerializer(many=True, required=False, max_length=BATCH_STATUS_MAX_SERVICES)
+    filter = ServiceBatchFilterSerializer(required=False)
+    
+    def validate(self, data):
+        given = [key for key in ('ids', 'items', 'filter') if key in data]
+        if len(given) != 1:
+            raise serializers.ValidationError("Provide exactly one of ids, items or filter.")
+        if 'filter' in data and not data['filter']:
+            raise serializers.ValidationError("filter needs at least one condition.")
+        return data
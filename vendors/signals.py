@@ -0,0 +1,9 @@
+from django.dispatch import Signal
+
+# Sent once per batch status update (not once per service).
+# Arguments: status, changes (list of (service_id, previous_status)), user
+services_status_changed = Signal()
+
+# Sent once per archived batch, after the services were moved to the archive
+# table. Arguments: ids
+services_archived = Signal()
@@ -0,0 +1,61 @@
+# Request coalescing for expensive cached results
+# When a cached result expires and 50 requests arrive at once, only one of them
+# computes it. Threads in the same process wait on a lock, other processes wait
+# on a lock key in the cache and then read the result the first one stored.
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+_guard = threading.Lock()
+_locks = {}
+
+
+@contextmanager
+def _key_lock(key):
+    with _guard:
+        entry = _locks.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _guard:
+            entry[1] -= 1
+            if not entry[1]:
+                _locks.pop(key, None)
+
+
+def cached_single_flight(key, compute, timeout):
+    """Get key from the cache, or compute it once for everyone asking at the same time"""
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    with _key_lock(key):
+        value = cache.get(key)
+        if value is not None:
+            return value
+
+        lock_key = f'{key}:lock'
+        deadline = time.monotonic() + settings.SINGLE_FLIGHT_WAIT
+        owns_lock = cache.add(lock_key, 1, settings.SINGLE_FLIGHT_LOCK_TIMEOUT)
+        while not owns_lock:
+            time.sleep(0.05)
+            value = cache.get(key)
+            if value is not None:
+                return value
+            if time.monotonic() > deadline:
+                # Whoever had the lock is taking too long, just do it ourselves
+                break
+            owns_lock = cache.add(lock_key, 1, settings.SINGLE_FLIGHT_LOCK_TIMEOUT)
+
+        try:
+            value = compute()
+            cache.set(key, value, timeout)
+        finally:
+            if owns_lock:
+                cache.delete(lock_key)
+        return value
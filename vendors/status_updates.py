@@ -0,0 +1,69 @@
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Service
+from .reminders import REMINDER_STATUSES
+from .signals import services_status_changed
+
+# Statuses that can still get reminders, their next_notification_at has to be
+# worked out again after the update. For any other status it's just cleared.
+REMINDER_ELIGIBLE_STATUSES = {status for statuses in REMINDER_STATUSES.values() for status in statuses}
+
+
+def batch_update_status(status, ids=None, expected=None, queryset=None, user=None):
+    """Set the status of many services with a single UPDATE ... RETURNING
+    
+    Pass either ids (with an optional matching list of expected updated_at
+    values, None meaning "don't check") or a queryset selecting the services.
+    Rows whose updated_at doesn't match aren't touched. Skips Service.save()
+    and post_save on purpose, one services_status_changed signal is sent for
+    the whole batch instead.
+    
+    Returns a list of (id, previous_status, updated_at) for the changed rows.
+    """
+    table = connection.ops.quote_name(Service._meta.db_table)
+    now = timezone.now()
+    
+    if queryset is not None:
+        subquery, params = queryset.order_by().values('id').query.sql_with_params()
+        source = f"(SELECT sub.id, NULL::timestamptz FROM ({subquery}) AS sub)"
+        source_params = list(params)
+    else:
+        source = "unnest(%s::bigint[], %s::timestamptz[])"
+        source_params = [list(ids), list(expected or [None] * len(ids))]
+    
+    # prev is the row as it was before the update, so we can return the old status
+    sql = f"""
+        UPDATE {table} AS s
+        SET status = %s,
+            updated_at = %s,
+            next_notification_at = CASE WHEN %s THEN s.next_notification_at ELSE NULL END
+        FROM {table} AS prev, {source} AS t(id, expected)
+        WHERE s.id = t.id
+          AND prev.id = s.id
+          AND s.status <> %s
+          AND (t.expected IS NULL OR s.updated_at = t.expected)
+        RETURNING s.id, prev.status, s.updated_at
+    """
+    params = [status, now, status in REMINDER_ELIGIBLE_STATUSES, *source_params, status]
+    
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            changed = cursor.fetchall()
+        
+        if changed and status in REMINDER_ELIGIBLE_STATUSES:
+            # The new status can change which reminders apply
+            services = list(Service.objects.filter(id__in=[row[0] for row in changed]).select_related('vendor'))
+            for service in services:
+                service.refresh_next_notification()
+            Service.objects.bulk_update(services, ['next_notification_at'])
+    
+    if changed:
+        services_status_changed.send(
+            sender=Service,
+            status=status,
+            changes=[(service_id, previous) for service_id, previous, _ in changed],
+            user=user,
+        )
+    return changed
@@ -1,3 +1,250 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from .models import Service, Vendor
+from .reminders import due_reminder_kinds, next_notification_date
+from .signals import services_status_changed
+from .status_updates import batch_update_status
+
+
+class BatchStatusTestMixin:
+    """A vendor and a helper to make services that are active today"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('batch', 'batch@example.com', 'password')
+        self.vendor = Vendor.objects.create(
+            name='Batch Vendor', contact_person='Batch', email='vendor@example.com',
+            created_by=self.user
+        )
+
+    def make_service(self, name, status='active', expires_in=10):
+        today = timezone.now().date()
+        return Service.objects.create(
+            vendor=self.vendor,
+            service_name=name,
+            start_date=today - timedelta(days=30),
+            expiry_date=today + timedelta(days=expires_in),
+            payment_due_date=today + timedelta(days=expires_in),
+            amount=Decimal('100.00'),
+            status=status,
+            created_by=self.user,
+        )
+
+
+class BatchUpdateServiceStatusViewTests(BatchStatusTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('service-status-batch')
+
+    def test_classifies_updated_unchanged_and_not_found(self):
+        active = self.make_service('Active')
+        completed = self.make_service('Completed', status='completed')
+        missing_id = completed.id + 1000
+
+        response = self.client.post(
+            self.url,
+            {'status': 'completed', 'ids': [active.id, completed.id, missing_id]},
+            format='json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row['id'], row['previous_status']) for row in response.data['updated']],
+            [(active.id, 'active')]
+        )
+        self.assertEqual(response.data['unchanged'], [completed.id])
+        self.assertEqual(response.data['conflicts'], [])
+        self.assertEqual(response.data['not_found'], [missing_id])
+        active.refresh_from_db()
+        self.assertEqual(active.status, 'completed')
+
+    def test_mismatched_updated_at_is_a_conflict(self):
+        current = self.make_service('Current')
+        stale = self.make_service('Stale')
+
+        response = self.client.post(
+            self.url,
+            {
+                'status': 'completed',
+                'items': [
+                    {'id': current.id, 'updated_at': current.updated_at.isoformat()},
+                    {'id': stale.id, 'updated_at': (stale.updated_at - timedelta(seconds=5)).isoformat()},
+                ],
+            },
+            format='json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.data['updated']], [current.id])
+        self.assertEqual(response.data['conflicts'], [stale.id])
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, 'active')
+
+    def test_filter_updates_matching_services(self):
+        matching = self.make_service('Matching', status='payment_pending')
+        other = self.make_service('Other')
+
+        response = self.client.post(
+            self.url,
+            {'status': 'completed', 'filter': {'vendor': self.vendor.id, 'status': 'payment_pending'}},
+            format='json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.data['updated']], [matching.id])
+        other.refresh_from_db()
+        self.assertEqual(other.status, 'active')
+
+    def test_filter_matching_too_many_services_is_rejected(self):
+        self.make_service('First', status='payment_pending')
+        self.make_service('Second', status='payment_pending')
+
+        with mock.patch('vendors.views.BATCH_STATUS_MAX_SERVICES', 1):
+            response = self.client.post(
+                self.url,
+                {'status': 'completed', 'filter': {'status': 'payment_pending'}},
+                format='json'
+            )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Service.objects.filter(status='completed').exists())
+
+    def test_needs_exactly_one_selector(self):
+        response = self.client.post(self.url, {'status': 'completed', 'ids': [1], 'filter': {'vendor': 1}}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class BatchUpdateStatusTests(BatchStatusTestMixin, TestCase):
+    def test_clears_next_notification_for_statuses_without_reminders(self):
+        service = self.make_service('Reminded')
+        self.assertIsNotNone(service.next_notification_at)
+
+        batch_update_status('completed', ids=[service.id])
+
+        service.refresh_from_db()
+        self.assertIsNone(service.next_notification_at)
+
+    def test_recomputes_next_notification_for_statuses_with_reminders(self):
+        service = self.make_service('Reactivated', status='completed', expires_in=40)
+        self.assertIsNone(service.next_notification_at)
+
+        batch_update_status('active', ids=[service.id])
+
+        service.refresh_from_db()
+        # Default schedule is 15 days before the expiry/payment due date
+        expected = service.expiry_date - timedelta(days=15)
+        self.assertEqual(timezone.localtime(service.next_notification_at).date(), expected)
+
+    def test_sends_one_signal_for_the_batch(self):
+        first = self.make_service('First')
+        second = self.make_service('Second', status='payment_pending')
+        unchanged = self.make_service('Unchanged', status='completed')
+        calls = []
+
+        def receiver(sender, **kwargs):
+            calls.append(kwargs)
+
+        services_status_changed.connect(receiver)
+        self.addCleanup(services_status_changed.disconnect, receiver)
+        batch_update_status('completed', ids=[first.id, second.id, unchanged.id], user=self.user)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(calls[0]['status'], 'completed')
+        self.assertEqual(calls[0]['user'], self.user)
+        self.assertEqual(
+            sorted(calls[0]['changes']),
+            sorted([(first.id, 'active'), (second.id, 'payment_pending')])
+        )
+
+    def test_no_signal_when_nothing_changed(self):
+        service = self.make_service('Done', status='completed')
+        calls = []
+
+        def receiver(sender, **kwargs):
+            calls.append(kwargs)
+
+        services_status_changed.connect(receiver)
+        self.addCleanup(services_status_changed.disconnect, receiver)
+
+        self.assertEqual(batch_update_status('completed', ids=[service.id]), [])
+        self.assertEqual(calls, [])
+
+
+class ReminderScheduleTests(SimpleTestCase):
+    today = date(2026, 3, 1)
+    schedule = [30, 15, 7, 1]
+
+    def targets(self, expiry_in, payment_in):
+        return [
+            ('expiry', self.today + timedelta(days=expiry_in)),
+            ('payment', self.today + timedelta(days=payment_in)),
+        ]
+
+    def test_next_date_is_the_earliest_threshold_of_either_kind(self):
+        next_date = next_notification_date(self.targets(40, 20), self.schedule, None, self.today)
+        # payment: 20 - 15 = 5 days away, expiry: 40 - 30 = 10 days away
+        self.assertEqual(next_date, self.today + timedelta(days=5))
+
+    def test_missed_threshold_is_due_today(self):
+        # Created 10 days inside the 30 day window
+        next_date = next_notification_date(self.targets(60, 20), self.schedule, None, self.today)
+        self.assertEqual(next_date, self.today)
+
+    def test_thresholds_up_to_last_notified_on_are_skipped(self):
+        # payment 20 days out: thresholds at -10, +5, +13, +19
+        last = self.today + timedelta(days=5)
+        next_date = next_notification_date(self.targets(100, 20), self.schedule, last, last)
+        self.assertEqual(next_date, self.today + timedelta(days=13))
+
+    def test_nothing_left_after_the_last_threshold_or_the_date(self):
+        last = self.today + timedelta(days=19)
+        self.assertIsNone(next_notification_date([('payment', self.today + timedelta(days=20))], self.schedule, last, last))
+        self.assertIsNone(next_notification_date([('payment', self.today - timedelta(days=1))], self.schedule, None, self.today))
+
+    def test_due_kinds_share_last_notified_on(self):
+        # Both kinds crossed a threshold since the last reminder
+        last = self.today - timedelta(days=10)
+        targets = self.targets(14, 7)
+        self.assertEqual(due_reminder_kinds(targets, self.schedule, last, self.today), ['expiry', 'payment'])
+        # A reminder for either kind today covers both until their next threshold
+        self.assertEqual(due_reminder_kinds(targets, self.schedule, self.today, self.today), [])
+
+    def test_one_reminder_per_kind_after_several_missed_thresholds(self):
+        # 15 and 7 days before were both missed, only one reminder goes out
+        targets = [('payment', self.today + timedelta(days=5))]
+        self.assertEqual(due_reminder_kinds(targets, self.schedule, None, self.today), ['payment'])
+
+    def test_no_reminder_once_the_date_has_passed(self):
+        targets = [('expiry', self.today - timedelta(days=1))]
+        self.assertEqual(due_reminder_kinds(targets, self.schedule, None, self.today), [])
+
+
+class ServiceReminderScheduleTests(BatchStatusTestMixin, TestCase):
+    def test_falls_back_to_the_vendor_schedule(self):
+        self.vendor.reminder_days = '30'
+        self.vendor.save()
+        service = self.make_service('Vendor schedule', expires_in=60)
+        self.assertEqual(service.reminder_schedule, [30])
+        self.assertEqual(
+            timezone.localtime(service.next_notification_at).date(),
+            service.expiry_date - timedelta(days=30)
+        )
+
+    def test_own_schedule_wins(self):
+        self.vendor.reminder_days = '30'
+        self.vendor.save()
+        service = self.make_service('Own schedule', expires_in=60)
+        service.reminder_days = '7'
+        service.save()
+        self.assertEqual(
+            timezone.localtime(service.next_notification_at).date(),
+            service.expiry_date - timedelta(days=7)
+        )
@@ -0,0 +1,133 @@
+# Token bucket throttles
+# A rate like "60/min" means a bucket of 60 requests that refills over a
+# minute, so short bursts are fine but a runaway loop gets cut off. Buckets
+# live in Redis (one atomic script call per request) and fall back to local
+# memory if Redis isn't configured or is down.
+import logging
+import threading
+import time
+
+import redis
+from django.conf import settings
+from rest_framework.throttling import SimpleRateThrottle
+
+logger = logging.getLogger(__name__)
+
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(now - ts, 0) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+# After a Redis error, use local buckets for this long before trying again
+REDIS_RETRY_SECONDS = 30
+
+
+class LocalBuckets:
+    """In-process token buckets, used when Redis isn't available"""
+
+    max_keys = 10000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def take(self, key, capacity, rate, now):
+        with self._lock:
+            tokens, ts = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + max(now - ts, 0) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            if len(self._buckets) >= self.max_keys and key not in self._buckets:
+                # Keep memory bounded, dropping a bucket just means it starts full
+                self._buckets.pop(next(iter(self._buckets)))
+            self._buckets[key] = (tokens, now)
+            return allowed, tokens
+
+
+_local_buckets = LocalBuckets()
+_script = None
+_redis_retry_at = 0.0
+
+
+def _redis_script():
+    global _script
+    if _script is None and settings.THROTTLE_REDIS_URL:
+        client = redis.Redis.from_url(settings.THROTTLE_REDIS_URL, socket_timeout=0.5)
+        _script = client.register_script(TOKEN_BUCKET_SCRIPT)
+    return _script
+
+
+def take_token(key, capacity, rate):
+    """Try to take one token. Returns (allowed, tokens left)."""
+    global _redis_retry_at
+    now = time.time()
+    script = _redis_script()
+    if script is not None and now >= _redis_retry_at:
+        try:
+            allowed, tokens = script(keys=[key], args=[capacity, rate, now])
+            return bool(allowed), float(tokens)
+        except redis.RedisError:
+            logger.warning('Throttle Redis unavailable, using local buckets', exc_info=True)
+            _redis_retry_at = now + REDIS_RETRY_SECONDS
+    return _local_buckets.take(key, capacity, rate, now)
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """Per user (or per IP when anonymous) token bucket for a scope"""
+
+    scope = 'user'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return f'throttle:{self.scope}:{ident}'
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+
+        rate = self.num_requests / self.duration
+        allowed, tokens = take_token(key, self.num_requests, rate)
+        self._wait = 0 if allowed else (1 - tokens) / rate
+        return allowed
+
+    def wait(self):
+        return self._wait
+
+
+class DashboardThrottle(TokenBucketThrottle):
+    scope = 'dashboard'
+
+
+class AnalyticsThrottle(TokenBucketThrottle):
+    scope = 'analytics'
+
+
+class SearchThrottle(TokenBucketThrottle):
+    """Only counts list requests that actually search"""
+
+    scope = 'search'
+
+    def allow_request(self, request, view):
+        if not request.query_params.get('search'):
+            return True
+        return super().allow_request(request, view)
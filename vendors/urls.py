@@ -10,15 +10,21 @@ urlpatterns = [
     # Vendors
     path('vendors/', views.VendorListCreateView.as_view(), name='vendor-list-create'),
     path('vendors/<int:pk>/', views.VendorDetailView.as_view(), name='vendor-detail'),
+    path('vendors/deletions/<str:job_id>/', views.vendor_deletion_status, name='vendor-deletion-status'),
     
     # Services
     path('services/', views.ServiceListCreateView.as_view(), name='service-list-create'),
     path('services/<int:pk>/', views.ServiceDetailView.as_view(), name='service-detail'),
     path('services/<int:pk>/status/', views.update_service_status, name='service-status-update'),
+    path('services/status/batch/', views.batch_update_service_status, name='service-status-batch'),
         path('services/expiring-soon/', views.services_expiring_soon, name='services-expiring-soon'),
         path('services/payment-due-soon/', views.services_payment_due_soon, name='services-payment-due-soon'),
         
         # Dashboard
         path('dashboard/stats/', views.dashboard_stats, name='dashboard-stats'),
+        path('dashboard/bundle/', views.dashboard_bundle, name='dashboard-bundle'),
+        
+        # Analytics
+        path('analytics/timeline/', views.analytics_timeline, name='analytics-timeline'),
         
     ]
@@ -1,23 +1,50 @@
 from rest_framework import generics, status, filters
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
+from celery.result import AsyncResult
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q, Sum
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import BooleanField, Count, ExpressionWrapper, Q, Sum, prefetch_related_objects
 from django.utils import timezone
-from datetime import timedelta
-from .models import Vendor, Service
+import uuid
+from datetime import date, timedelta
+from functools import reduce
+from operator import or_
+from .models import Vendor, Service, ArchivedService
+from .analytics import MAX_BUCKETS, MAX_VENDOR_BUCKETS, TRUNC_FUNCTIONS, bucket_starts, build_timeline, timeline_vendor_count
+from .reminders import reminder_window_days
+from .tasks import DELETION_JOB_TIMEOUT, delete_vendor, deletion_job_key
+from .dashboard_cache import dashboard_cache_version
+from .single_flight import cached_single_flight
+from .status_updates import batch_update_status
+from .throttling import AnalyticsThrottle, DashboardThrottle, SearchThrottle, TokenBucketThrottle
 from .serializers import (
     VendorSerializer, ServiceSerializer, ServiceCreateSerializer,
-    VendorListSerializer, ServiceStatusUpdateSerializer
+    VendorListSerializer, ServiceStatusUpdateSerializer, ServiceBatchStatusSerializer,
+    BATCH_STATUS_MAX_SERVICES
 )
 
 
-class VendorListCreateView(generics.ListCreateAPIView):
+class SparseFieldsMixin:
+    """Narrow GET querysets to what ?fields= and ?expand= ask for"""
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        serializer_class = self.get_serializer_class()
+        if self.request.method == 'GET' and hasattr(serializer_class, 'optimize_queryset'):
+            queryset = serializer_class.optimize_queryset(queryset, self.request)
+        return queryset
+
+
+class VendorListCreateView(SparseFieldsMixin, generics.ListCreateAPIView):
     """Handle listing and creating vendors"""
     
     queryset = Vendor.objects.all()
     permission_classes = [IsAuthenticated]
+    throttle_classes = [TokenBucketThrottle, SearchThrottle]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['status']
     search_fields = ['name', 'contact_person', 'email']
@@ -35,54 +62,136 @@ class VendorListCreateView(generics.ListCreateAPIView):
         serializer.save(created_by=self.request.user)
 
 
-class VendorDetailView(generics.RetrieveUpdateDestroyAPIView):
+class VendorDetailView(SparseFieldsMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Vendor.objects.all()
     serializer_class = VendorSerializer
     permission_classes = [IsAuthenticated]
     
-    def perform_update(self, serializer):
-        serializer.save(created_by=self.request.user)
+    def destroy(self, request, *args, **kwargs):
+        # Vendors can have tens of thousands of services, too many to delete
+        # inside the request. Mark it inactive now and delete in the background.
+        vendor = self.get_object()
+        job_id = str(uuid.uuid4())
+        if cache.add(deletion_job_key(vendor.pk), job_id, DELETION_JOB_TIMEOUT):
+            # save() rather than update() so the change is audited
+            vendor.status = 'inactive'
+            vendor.save(update_fields=['status', 'updated_at'])
+            delete_vendor.apply_async(
+                args=[vendor.pk], kwargs={'user_id': request.user.pk}, task_id=job_id
+            )
+        else:
+            # Already being deleted, point at the job that's running
+            job_id = cache.get(deletion_job_key(vendor.pk)) or job_id
+        
+        return Response(
+            {
+                'job_id': job_id,
+                'status_url': reverse('vendor-deletion-status', args=[job_id], request=request),
+            },
+            status=status.HTTP_202_ACCEPTED
+        )
 
 
-class ServiceListCreateView(generics.ListCreateAPIView):
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def vendor_deletion_status(request, job_id):
+    """Check on a vendor deletion started with DELETE /vendors/<id>/"""
+    result = AsyncResult(job_id)
+    data = {'job_id': job_id, 'status': result.state}
+    
+    if result.state == 'PROGRESS':
+        data.update(result.info)
+    elif result.successful():
+        data.update(result.result)
+    elif result.failed():
+        data['error'] = str(result.result)
+    
+    return Response(data)
+
+
+class ServiceListCreateView(SparseFieldsMixin, generics.ListCreateAPIView):
+    queryset = Service.objects.select_related('vendor', 'created_by')
     permission_classes = [IsAuthenticated]
+    throttle_classes = [TokenBucketThrottle, SearchThrottle]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['vendor', 'status']
     search_fields = ['service_name', 'vendor__name']
     ordering_fields = ['service_name', 'start_date', 'expiry_date', 'payment_due_date', 'amount']
     ordering = ['-created_at']
     
-    def get_queryset(self):
-        return Service.objects.select_related('vendor', 'created_by')
-    
     def get_serializer_class(self):
         if self.request.method == 'GET':
             return ServiceSerializer
         return ServiceCreateSerializer
     
+    @property
+    def include_archived(self):
+        # Archived services are only listed when asked for with ?include_archived=true
+        value = self.request.query_params.get('include_archived', '')
+        return self.request.method == 'GET' and value.lower() in ('1', 'true', 'yes')
+    
+    def filter_queryset(self, queryset):
+        if not self.include_archived:
+            return super().filter_queryset(queryset)
+        
+        # Filter the live and archived tables separately and union them.
+        # Both sides have to load the same columns, including whatever the
+        # combined query is ordered by (archived_at is never loaded).
+        ordering_filter = filters.OrderingFilter()
+        ordering = ordering_filter.get_ordering(self.request, queryset, self) or []
+        ordering_columns = [field.lstrip('-') for field in ordering]
+        
+        parts = []
+        for part in (Service.objects.all(), ArchivedService.objects.all()):
+            part = ServiceSerializer.optimize_queryset(part, self.request, extra_columns=ordering_columns)
+            for backend in (DjangoFilterBackend, filters.SearchFilter):
+                part = backend().filter_queryset(self.request, part, self)
+            parts.append(part.select_related(None).order_by())
+        
+        combined = parts[0].union(parts[1], all=True)
+        return combined.order_by(*ordering)
+    
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        _, expanded = ServiceSerializer.requested_fields(self.request)
+        if page is not None and self.include_archived and 'created_by' in expanded:
+            # union() can't use select_related, so load the creators in one query
+            prefetch_related_objects(page, 'created_by')
+        return page
+    
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
 
-class ServiceDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ServiceDetailView(SparseFieldsMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Service.objects.select_related('vendor', 'created_by')
     serializer_class = ServiceSerializer
     permission_classes = [IsAuthenticated]
-    
-    def perform_update(self, serializer):
-        serializer.save(created_by=self.request.user)
+
+
+def _expiring_soon_filter(today):
+    """Active services that expire within the reminder window"""
+    window_end = today + timedelta(days=reminder_window_days())
+    return Q(expiry_date__range=[today, window_end], status='active')
+
+
+def _payment_due_soon_filter(today):
+    """Services with payment due within the reminder window"""
+    window_end = today + timedelta(days=reminder_window_days())
+    return Q(
+        payment_due_date__range=[today, window_end],
+        status__in=['active', 'payment_pending']
+    )
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def services_expiring_soon(request):
-    """Get services that expire within 15 days"""
+    """Get services that expire within the reminder window (15 days by default)"""
     today = timezone.now().date()
-    fifteen_days_later = today + timedelta(days=15)
     
     services = Service.objects.filter(
-        expiry_date__range=[today, fifteen_days_later],
-        status='active'
+        _expiring_soon_filter(today)
     ).select_related('vendor', 'created_by')
     
     serializer = ServiceSerializer(services, many=True)
@@ -92,13 +201,11 @@ def services_expiring_soon(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def services_payment_due_soon(request):
-    """Get services with payment due within 15 days"""
+    """Get services with payment due within the reminder window (15 days by default)"""
     today = timezone.now().date()
-    fifteen_days_later = today + timedelta(days=15)
     
     services = Service.objects.filter(
-        payment_due_date__range=[today, fifteen_days_later],
-        status__in=['active', 'payment_pending']
+        _payment_due_soon_filter(today)
     ).select_related('vendor', 'created_by')
     
     serializer = ServiceSerializer(services, many=True)
@@ -110,7 +217,8 @@ def services_payment_due_soon(request):
 def update_service_status(request, pk):
     """Update service status (active, expired, etc.)"""
     try:
-        service = Service.objects.get(pk=pk)
+        # save() reads the vendor's reminder schedule
+        service = Service.objects.select_related('vendor').get(pk=pk)
     except Service.DoesNotExist:
         return Response(
             {'error': 'Service not found'}, 
@@ -124,51 +232,271 @@ def update_service_status(request, pk):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def batch_update_service_status(request):
+    """Update the status of many services in one go
+    
+    Body: {"status": "completed"} plus one of "ids": [1, 2],
+    "items": [{"id": 1, "updated_at": "..."}] or "filter": {"vendor": 1, ...}.
+    """
+    serializer = ServiceBatchStatusSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    data = serializer.validated_data
+    
+    if 'filter' in data:
+        conditions = data['filter']
+        services = Service.objects.all()
+        if 'vendor' in conditions:
+            services = services.filter(vendor_id=conditions['vendor'])
+        if 'status' in conditions:
+            services = services.filter(status=conditions['status'])
+        if 'expiry_date_before' in conditions:
+            services = services.filter(expiry_date__lt=conditions['expiry_date_before'])
+        if 'payment_due_date_before' in conditions:
+            services = services.filter(payment_due_date__lt=conditions['payment_due_date_before'])
+        # Same cap as ids/items: look at one more than allowed and refuse
+        # rather than updating the whole table in one statement
+        ids = list(
+            services.exclude(status=data['status'])
+            .order_by('id')
+            .values_list('id', flat=True)[:BATCH_STATUS_MAX_SERVICES + 1]
+        )
+        if len(ids) > BATCH_STATUS_MAX_SERVICES:
+            return Response(
+                {'error': f'The filter matches more than {BATCH_STATUS_MAX_SERVICES} services, narrow it down.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        # Filtered again inside the UPDATE, in case a row changed since
+        changed = batch_update_status(data['status'], queryset=services.filter(id__in=ids), user=request.user)
+        requested = []
+    else:
+        items = data.get('items') or [{'id': service_id} for service_id in data['ids']]
+        requested = [item['id'] for item in items]
+        changed = batch_update_status(
+            data['status'],
+            ids=requested,
+            expected=[item.get('updated_at') for item in items],
+            user=request.user
+        )
+    
+    result = {
+        'status': data['status'],
+        'updated': [
+            {'id': service_id, 'previous_status': previous, 'updated_at': updated_at}
+            for service_id, previous, updated_at in changed
+        ],
+        'unchanged': [],
+        'conflicts': [],
+        'not_found': [],
+    }
+    
+    # Only look up why some weren't updated when that actually happened
+    missing = set(requested) - {row[0] for row in changed}
+    if missing:
+        current = dict(Service.objects.filter(id__in=missing).values_list('id', 'status'))
+        for service_id in sorted(missing):
+            if service_id not in current:
+                result['not_found'].append(service_id)
+            elif current[service_id] == data['status']:
+                result['unchanged'].append(service_id)
+            else:
+                result['conflicts'].append(service_id)
+    
+    return Response(result)
+
+
+def _dashboard_stats(today):
+    """Work out the dashboard numbers with one aggregate query per table (archive included)"""
+    vendor_counts = Vendor.objects.aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(status='active')),
+    )
+    
+    service_counts = Service.objects.aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(status='active')),
+        expiring_soon=Count('id', filter=_expiring_soon_filter(today)),
+        payment_due_soon=Count('id', filter=_payment_due_soon_filter(today)),
+        # Overdue services (past due date)
+        overdue=Count('id', filter=Q(
+            payment_due_date__lt=today,
+            status__in=['active', 'payment_pending']
+        )),
+        total_contract_value=Sum('amount'),
+    )
+    # Archived services are completed/expired, so they only count towards the
+    # totals. Without them the totals would drop every night.
+    archived_counts = ArchivedService.objects.aggregate(
+        total=Count('id'),
+        total_contract_value=Sum('amount'),
+    )
+    
+    return {
+        'total_vendors': vendor_counts['total'],
+        'active_vendors': vendor_counts['active'],
+        'total_services': service_counts['total'] + archived_counts['total'],
+        'active_services': service_counts['active'],
+        'expiring_soon': service_counts['expiring_soon'],
+        'payment_due_soon': service_counts['payment_due_soon'],
+        'overdue_services': service_counts['overdue'],
+        'total_contract_value': float(
+            (service_counts['total_contract_value'] or 0) + (archived_counts['total_contract_value'] or 0)
+        ),
+    }
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([TokenBucketThrottle, DashboardThrottle])
 def dashboard_stats(request):
     """Get basic dashboard statistics for the frontend"""
     today = timezone.now().date()
-    fifteen_days_later = today + timedelta(days=15)
-    
-    # Basic counts
-    total_vendors = Vendor.objects.count()
-    active_vendors = Vendor.objects.filter(status='active').count()
-    total_services = Service.objects.count()
-    active_services = Service.objects.filter(status='active').count()
-    
-    # Expiring and payment due counts
-    expiring_soon = Service.objects.filter(
-        expiry_date__range=[today, fifteen_days_later],
-        status='active'
-    ).count()
-    
-    payment_due_soon = Service.objects.filter(
-        payment_due_date__range=[today, fifteen_days_later],
-        status__in=['active', 'payment_pending']
-    ).count()
+    stats = cached_single_flight(
+        f"dashboard_stats:{dashboard_cache_version()}:{today.isoformat()}",
+        lambda: _dashboard_stats(today),
+        settings.DASHBOARD_CACHE_TIMEOUT
+    )
+    return Response(stats)
+
+
+DASHBOARD_SECTIONS = ['stats', 'expiring_soon', 'payment_due_soon']
+
+
+def _build_dashboard_bundle(today, sections):
+    """Build the requested dashboard sections from a single service query"""
+    bundle = {}
     
-    # Overdue services (past due date)
-    overdue_services = Service.objects.filter(
-        payment_due_date__lt=today,
-        status__in=['active', 'payment_pending']
-    ).count()
-    
-    # Total contract value
-    total_contract_value = Service.objects.aggregate(
-        total=Sum('amount')
-    )['total'] or 0
-    
-    stats = {
-        'total_vendors': total_vendors,
-        'active_vendors': active_vendors,
-        'total_services': total_services,
-        'active_services': active_services,
-        'expiring_soon': expiring_soon,
-        'payment_due_soon': payment_due_soon,
-        'overdue_services': overdue_services,
-        'total_contract_value': float(total_contract_value),
+    if 'stats' in sections:
+        bundle['stats'] = _dashboard_stats(today)
+    
+    section_filters = {
+        'expiring_soon': _expiring_soon_filter(today),
+        'payment_due_soon': _payment_due_soon_filter(today),
     }
+    list_sections = [name for name in section_filters if name in sections]
+    if not list_sections:
+        return bundle
     
-    return Response(stats)
+    # One query for the union of both windows, flagging which window each row is in
+    services = Service.objects.filter(
+        reduce(or_, [section_filters[name] for name in list_sections])
+    ).select_related('created_by').annotate(**{
+        f'in_{name}': ExpressionWrapper(section_filters[name], output_field=BooleanField())
+        for name in list_sections
+    })
+    
+    services = list(services)
+    serialized = ServiceSerializer(services, many=True).data
+    
+    # Each service is serialized once and the sections just list ids
+    bundle['services'] = {str(item['id']): dict(item) for item in serialized}
+    for name in list_sections:
+        bundle[name] = [service.id for service in services if getattr(service, f'in_{name}')]
+    
+    return bundle
+
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@throttle_classes([TokenBucketThrottle, DashboardThrottle])
+def dashboard_bundle(request):
+    """Get stats, expiring soon and payment due soon in one call
+    
+    Use ?sections=stats,expiring_soon to only get some of the sections.
+    """
+    sections = DASHBOARD_SECTIONS
+    if request.query_params.get('sections'):
+        sections = [s.strip() for s in request.query_params['sections'].split(',') if s.strip()]
+        invalid = [s for s in sections if s not in DASHBOARD_SECTIONS]
+        if invalid:
+            return Response(
+                {'error': f"Invalid sections: {', '.join(invalid)}. Must be any of: {', '.join(DASHBOARD_SECTIONS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+    
+    today = timezone.now().date()
+    cache_key = (
+        f"dashboard_bundle:{dashboard_cache_version()}:{today.isoformat()}:"
+        f"{','.join(sorted(set(sections)))}"
+    )
+    
+    bundle = cached_single_flight(
+        cache_key,
+        lambda: _build_dashboard_bundle(today, sections),
+        settings.DASHBOARD_CACHE_TIMEOUT
+    )
+    return Response(bundle)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@throttle_classes([TokenBucketThrottle, AnalyticsThrottle])
+def analytics_timeline(request):
+    """Payments due, expiring contracts and overdue value bucketed over time
+    
+    Query params: start, end (YYYY-MM-DD, default one year either side of
+    today), granularity (day/week/month), vendor, by_vendor, window, forecast.
+    """
+    params = request.query_params
+    today = timezone.now().date()
+    
+    try:
+        start = date.fromisoformat(params['start']) if params.get('start') else today - timedelta(days=365)
+        end = date.fromisoformat(params['end']) if params.get('end') else today + timedelta(days=365)
+        vendor_id = int(params['vendor']) if params.get('vendor') else None
+        window = int(params.get('window', 3))
+        forecast = int(params.get('forecast', 3))
+    except ValueError:
+        return Response(
+            {'error': 'start/end must be YYYY-MM-DD dates and vendor/window/forecast must be numbers'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    granularity = params.get('granularity', 'month')
+    if granularity not in TRUNC_FUNCTIONS:
+        return Response(
+            {'error': f"Invalid granularity. Must be one of: {', '.join(TRUNC_FUNCTIONS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if end < start:
+        return Response({'error': 'end must not be before start'}, status=status.HTTP_400_BAD_REQUEST)
+    if window < 1 or not 0 <= forecast <= 60:
+        return Response(
+            {'error': 'window must be at least 1 and forecast between 0 and 60'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    by_vendor = params.get('by_vendor', '').lower() in ('1', 'true', 'yes')
+    
+    # Check the size before running anything, a wide range of days would
+    # otherwise build (and cache) a huge response
+    bucket_count = len(bucket_starts(start, end, granularity))
+    if bucket_count > MAX_BUCKETS:
+        return Response(
+            {'error': f'Too many buckets ({bucket_count}), at most {MAX_BUCKETS}. Use a shorter range or a coarser granularity.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if by_vendor:
+        cells = bucket_count * timeline_vendor_count(start, end, vendor_id)
+        if cells > MAX_VENDOR_BUCKETS:
+            return Response(
+                {'error': f'Too many vendors x buckets ({cells}), at most {MAX_VENDOR_BUCKETS}. Use a shorter range, a coarser granularity or filter by vendor.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+    
+    # Overdue depends on today, so that's part of the key too
+    cache_key = (
+        f"analytics_timeline:{today.isoformat()}:{start.isoformat()}:{end.isoformat()}:"
+        f"{granularity}:{vendor_id}:{by_vendor}:{window}:{forecast}"
+    )
+    timeline = cached_single_flight(
+        cache_key,
+        lambda: build_timeline(
+            start, end, granularity,
+            vendor_id=vendor_id, by_vendor=by_vendor,
+            window=window, forecast=forecast
+        ),
+        settings.ANALYTICS_CACHE_TIMEOUT
+    )
+    return Response(timeline)